@@ -0,0 +1,204 @@
+from flask import Blueprint, Response, abort, current_app, request, url_for
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+  import json
+
+from extensions import db
+from booking import BookingError, book_shows, parse_show
+from cache import cached_data
+from conditional import conditional, current_version, detail_version, listings_version
+from models import Venue, Artist, Show, Genre
+from pagination import keyset_paginate
+from read_models import ShowItem
+from search import search
+
+#----------------------------------------------------------------------------#
+# JSON API, /api/v1.
+#
+# Uses the same queries and format() dicts as the HTML views, with genres
+# loaded by selectinload, so every endpoint runs a fixed number of queries
+# whatever the page size. ?fields=id,name,... trims the response; a detail
+# request that asks for no show fields skips loading the shows altogether.
+# ETag and Last-Modified come from the same record versions as the pages.
+# POST /shows lists one show or a whole tour through booking.py.
+#
+# The detail and search endpoints also have async variants on the asyncio
+# engine (async_api.py), with the same responses and ETags.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+SHOW_FIELDS = {'past_shows', 'past_shows_count', 'upcoming_shows', 'upcoming_shows_count'}
+
+def dumps(payload):
+  if orjson is not None:
+    return orjson.dumps(payload)
+  # datetimes are the only values json can't encode; orjson writes them
+  # as isoformat() too.
+  return json.dumps(payload, default=lambda value: value.isoformat()).encode()
+
+def parse_fields(fields):
+  # The field names in a ?fields= value, or None for all of them.
+  if not fields:
+    return None
+  return {field.strip() for field in fields.split(',') if field.strip()}
+
+def _fields():
+  return parse_fields(request.args.get('fields'))
+
+def select_fields(item, fields):
+  if fields is None:
+    return item
+  return {key: value for key, value in item.items() if key in fields}
+
+def _json(payload, status=200):
+  return Response(dumps(payload), status=status, mimetype='application/json')
+
+def _page_links(page):
+  links = {'next': None, 'prev': None}
+  for name, cursor in (('next', page.next_cursor), ('prev', page.prev_cursor)):
+    if cursor:
+      links[name] = url_for(request.endpoint, cursor=cursor, **request.view_args, **page.params)
+  return links
+
+def _listing(page, items, fields):
+  return _json({'data': [select_fields(item, fields) for item in items], **_page_links(page)})
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def _error(error):
+  return _json({'error': error.name}, error.code)
+
+#  ----------------------------------------------------------------
+#  Venues and artists
+#  ----------------------------------------------------------------
+
+def _summary(record):
+  item = {
+    'id': record.id,
+    'name': record.name,
+    'city': record.city,
+    'state': record.state,
+    'genres': [genre.name for genre in record.genres],
+    'upcoming_shows_count': record.upcoming_shows_count
+  }
+  if isinstance(record, Venue):
+    item['address'] = record.address
+  return item
+
+def _list(model, key):
+  # Entities in listing order with their genres (one extra query); upcoming
+  # show counts are the stored counters.
+  fields = _fields()
+  genre = request.args.get('genre')
+  query = model.query.options(db.selectinload(model.genres))
+  if genre:
+    query = query.filter(model.in_genres([Genre.id_for(genre)]))
+  if model is Venue and request.args.get('city') and request.args.get('state'):
+    query = query.filter(Venue.city == request.args['city'], Venue.state == request.args['state'])
+
+  page = keyset_paginate(
+    query,
+    key,
+    cursor=request.args.get('cursor'),
+    per_page=current_app.config['PAGE_SIZE'],
+    params={
+      'genre': genre,
+      'city': request.args.get('city'),
+      'state': request.args.get('state'),
+      'fields': request.args.get('fields')
+    }
+  )
+  return _listing(page, [_summary(record) for record in page], fields)
+
+def _detail(model, kind, id):
+  fields = _fields()
+  if fields is not None and not fields & SHOW_FIELDS:
+    record = model.query.options(db.selectinload(model.genres)).get(id)
+    data = record.format(shows=[]) if record is not None else None
+  else:
+    data = cached_data(kind, id, current_version(), lambda: model.load_detail(id))
+  if data is None:
+    abort(404)
+  return _json(select_fields(data, fields))
+
+def search_response(result):
+  return {**result, 'data': [item._asdict() for item in result['data']]}
+
+def _search(model):
+  # ?search_term=...&page=n, ranked as on the search pages.
+  result = search(
+    model,
+    request.args.get('search_term', ''),
+    request.args.get('page', 1, type=int),
+    current_app.config['SEARCH_PAGE_SIZE']
+  )
+  return _json(search_response(result))
+
+@api.route('/venues')
+@conditional(lambda: listings_version(Venue))
+def venues():
+  return _list(Venue, Venue.listing_key())
+
+@api.route('/venues/<int:venue_id>')
+@conditional(lambda venue_id: detail_version(Venue, venue_id))
+def venue(venue_id):
+  return _detail(Venue, 'venue', venue_id)
+
+@api.route('/venues/search')
+def search_venues():
+  return _search(Venue)
+
+@api.route('/artists')
+@conditional(lambda: listings_version(Artist))
+def artists():
+  return _list(Artist, Artist.listing_key())
+
+@api.route('/artists/<int:artist_id>')
+@conditional(lambda artist_id: detail_version(Artist, artist_id))
+def artist(artist_id):
+  return _detail(Artist, 'artist', artist_id)
+
+@api.route('/artists/search')
+def search_artists():
+  return _search(Artist)
+
+#  ----------------------------------------------------------------
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+@conditional(lambda: listings_version(Show, Venue, Artist))
+def shows():
+  fields = _fields()
+  page = keyset_paginate(
+    Show.listing_query(),
+    Show.listing_key(),
+    cursor=request.args.get('cursor'),
+    per_page=current_app.config['PAGE_SIZE'],
+    descending=True,
+    params={'fields': request.args.get('fields')},
+    item_type=ShowItem
+  )
+  items = [show._asdict() for show in page]
+  return _listing(page, items, fields)
+
+@api.route('/shows', methods=['POST'])
+def create_shows():
+  # One show as an object or a whole tour as an array, listed all or none:
+  # {"artist_id": 1, "venue_id": 2, "start_time": "2026-05-01T20:00:00"}
+  payload = request.get_json(silent=True)
+  if payload is None:
+    abort(400)
+  items = payload if isinstance(payload, list) else [payload]
+  if not items or len(items) > current_app.config['SHOW_BATCH_LIMIT']:
+    return _json({'error': f"Send 1 to {current_app.config['SHOW_BATCH_LIMIT']} shows."}, 422)
+  try:
+    shows = [parse_show(item, index) for index, item in enumerate(items)]
+    created = book_shows(shows, current_app.config['SHOW_BOOKING_GAP_MINUTES'])
+  except BookingError as e:
+    return _json({'error': str(e), 'index': e.index}, e.status)
+  return _json({'created': created}, 201)
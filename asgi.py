@@ -0,0 +1,13 @@
+from app import create_app
+from async_api import AsyncAPI
+
+#----------------------------------------------------------------------------#
+# ASGI entry point for the async mode (see async_api.py), e.g.
+#
+#   uvicorn asgi:application --workers 4
+#
+# Needs asgiref and the asyncio driver of the database (asyncpg or
+# aiosqlite) besides requirements.txt.
+#----------------------------------------------------------------------------#
+
+application = AsyncAPI(create_app())
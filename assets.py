@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+from functools import lru_cache
+
+from flask import abort, request, send_file, url_for
+from werkzeug.utils import safe_join
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+try:
+  import rjsmin
+except ImportError:
+  rjsmin = None
+
+#----------------------------------------------------------------------------#
+# Static asset bundles.
+#
+# `flask build-assets` concatenates and minifies each bundle below into
+# static/dist/<name>.<hash>.<ext>, writes .gz (and .br, with the brotli
+# package installed) next to it and records the file names in
+# static/dist/manifest.json. With ASSET_BUNDLES on, asset_urls() in the
+# templates links the hashed file, served by serve_asset() with the best
+# precompressed variant the client accepts and a one-year immutable
+# Cache-Control: a changed bundle gets a new name, so nothing is revalidated.
+#
+# Without a build, or with ASSET_BUNDLES off (the dev default), asset_urls()
+# links the source files instead and edits show up on reload.
+#----------------------------------------------------------------------------#
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = os.path.join(DIST_DIR, 'manifest.json')
+
+# Bundle name -> source files under static/, in load order.
+BUNDLES = {
+  'fyyur.css': [
+    'css/bootstrap.min.css',
+    'css/layout.main.css',
+    'css/main.css',
+    'css/main.responsive.css',
+    'css/main.quickfix.css',
+  ],
+  # Loaded in <head>: script.js formats show times with moment.
+  'head.js': [
+    'js/libs/modernizr-2.8.2.min.js',
+    'js/libs/moment.min.js',
+  ],
+  # Deferred, after jQuery.
+  'fyyur.js': [
+    'js/script.js',
+    'js/libs/bootstrap-3.1.1.min.js',
+    'js/plugins.js',
+  ],
+  'jquery.js': ['js/libs/jquery-1.11.1.min.js'],
+  'respond.js': ['js/libs/respond-1.4.2.min.js'],
+}
+
+# Precompressed variants, in order of preference: (encoding, suffix).
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+#  ----------------------------------------------------------------
+#  Build
+#  ----------------------------------------------------------------
+
+_css_comment = re.compile(r'/\*(?!!).*?\*/', re.S)
+_css_space = re.compile(r'\s+')
+_css_punctuation = re.compile(r'\s*([{};,>])\s*')
+_css_url = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+def _rebase_css_urls(css, source):
+  # Relative url()s point next to the source file; rewrite them relative to
+  # static/dist/ so fonts and images still resolve from the bundle.
+  base = posixpath.dirname(source)
+
+  def rebase(match):
+    quote, url = match.groups()
+    if url.startswith(('/', 'data:', 'http:', 'https:', '#')):
+      return match.group(0)
+    target = posixpath.normpath(posixpath.join(base, url))
+    return f'url({quote}{posixpath.relpath(target, "dist")}{quote})'
+
+  return _css_url.sub(rebase, css)
+
+def minify_css(css):
+  # Keeps /*! license */ comments.
+  css = _css_comment.sub('', css)
+  css = _css_space.sub(' ', css)
+  css = _css_punctuation.sub(r'\1', css)
+  return css.replace(';}', '}').strip()
+
+def minify_js(js):
+  # Without rjsmin the sources are only concatenated; the libraries are
+  # shipped minified already.
+  if rjsmin is None:
+    return js.strip()
+  return rjsmin.jsmin(js)
+
+def _bundle(name, sources):
+  parts = []
+  for source in sources:
+    with open(os.path.join(STATIC_DIR, source), encoding='utf-8') as file:
+      text = file.read()
+    if name.endswith('.css'):
+      parts.append(minify_css(_rebase_css_urls(text, source)))
+    else:
+      parts.append(minify_js(text))
+  # A newline (and a ';' between scripts) keeps one file's last statement
+  # from running into the next.
+  return ('\n' if name.endswith('.css') else ';\n').join(parts).encode('utf-8')
+
+def _write(path, data):
+  with open(path, 'wb') as file:
+    file.write(data)
+
+def build_assets():
+  # Writes every bundle and its compressed variants and returns
+  # {bundle: (file name, {suffix: size})}. Earlier builds are left in place
+  # so pages rendered (or cached) before a deploy still load their assets;
+  # delete static/dist/ to prune them.
+  os.makedirs(DIST_DIR, exist_ok=True)
+  manifest, report = {}, {}
+  for name, sources in BUNDLES.items():
+    data = _bundle(name, sources)
+    stem, ext = os.path.splitext(name)
+    filename = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+    path = os.path.join(DIST_DIR, filename)
+    sizes = {'': len(data)}
+    _write(path, data)
+    gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+    _write(path + '.gz', gzipped)
+    sizes['.gz'] = len(gzipped)
+    if brotli is not None:
+      brotlied = brotli.compress(data, quality=11)
+      _write(path + '.br', brotlied)
+      sizes['.br'] = len(brotlied)
+    manifest[name] = filename
+    report[name] = (filename, sizes)
+
+  with open(MANIFEST, 'w') as file:
+    json.dump(manifest, file, indent=2, sort_keys=True)
+  return report
+
+#  ----------------------------------------------------------------
+#  Serving
+#  ----------------------------------------------------------------
+
+def _load_manifest():
+  # {bundle: file name} for the last build, empty when there is none.
+  try:
+    with open(MANIFEST) as file:
+      return json.load(file)
+  except FileNotFoundError:
+    return {}
+
+@lru_cache(maxsize=256)
+def _variants(filename):
+  # The built file's path and its [(encoding, suffix), ...] variants, or
+  # None for anything that is not a built bundle. Built files never change.
+  path = safe_join(DIST_DIR, filename)
+  if path is None or filename == 'manifest.json' or not os.path.isfile(path):
+    return None
+  return path, [
+    (encoding, suffix) for encoding, suffix in ENCODINGS
+    if os.path.isfile(path + suffix)
+  ]
+
+def init_assets(app):
+  manifest = _load_manifest() if app.config['ASSET_BUNDLES'] else {}
+
+  def asset_urls(name):
+    # The URLs to link for a bundle: its hashed build, or its source files.
+    if name in manifest:
+      return [url_for('assets', filename=manifest[name])]
+    return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+  def serve_asset(filename):
+    built = _variants(filename)
+    if built is None:
+      abort(404)
+    path, variants = built
+    encoding = None
+    for candidate, suffix in variants:
+      if request.accept_encodings[candidate]:
+        encoding, path = candidate, path + suffix
+        break
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], conditional=True)
+    if encoding:
+      response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+  # More specific than the /static/<path:filename> rule, so it wins.
+  app.add_url_rule('/static/dist/<path:filename>', 'assets', serve_asset)
+  app.jinja_env.globals['asset_urls'] = asset_urls
@@ -0,0 +1,232 @@
+import random
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+from itsdangerous import BadSignature
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import HTTP_STATUS_CODES, http_date, parse_cookie, parse_etags, quote_etag
+from werkzeug.routing import Map, Rule
+from werkzeug.urls import url_decode
+
+from api import SHOW_FIELDS, dumps, parse_fields, search_response, select_fields
+from cache import cached_data_async
+from compression import choose_compressor
+from conditional import make_etag, version_of
+from extensions import db
+from models import Venue, Artist, Genre
+from routing import READ_METHODS, replica_binds
+from search import fts_exists_statement, search_result, search_statements
+
+#----------------------------------------------------------------------------#
+# Async mode: ASGI app with the read-heavy API on SQLAlchemy's asyncio engine.
+#
+# AsyncAPI serves GET /api/v1/venues/<id>, /api/v1/artists/<id> and the two
+# /search endpoints itself, with the same statements, cache, JSON and ETags
+# as api.py; a request waiting on the database only holds a coroutine, so
+# one process keeps many of them in flight. Every other request goes to the
+# Flask app through asgiref's WsgiToAsgi, on a thread as before.
+#
+# Reads use a replica when DATABASE_REPLICA_URLS is set, except for a
+# visitor whose Flask session is still pinned to the primary after a write
+# (see routing.py). The async endpoints are not profiled and not counted in
+# /metrics.
+#----------------------------------------------------------------------------#
+
+ASYNC_DRIVERS = {
+  'postgresql': 'postgresql+asyncpg',
+  'sqlite': 'sqlite+aiosqlite',
+}
+
+def async_url(url):
+  # The same database through its asyncio driver.
+  scheme, rest = url.split('://', 1)
+  backend = scheme.split('+')[0]
+  if backend not in ASYNC_DRIVERS:
+    raise RuntimeError(f'No asyncio driver configured for {backend}')
+  return f'{ASYNC_DRIVERS[backend]}://{rest}'
+
+def async_engine_options(settings):
+  # config.engine_options() for the async pool, which is shared by all the
+  # requests in flight in one process.
+  url = settings['SQLALCHEMY_DATABASE_URI']
+  if url.startswith('sqlite'):
+    return {}
+  options = {
+    'pool_size': settings['ASYNC_DB_POOL_SIZE'],
+    'max_overflow': settings['ASYNC_DB_MAX_OVERFLOW'],
+    'pool_timeout': settings['DB_POOL_TIMEOUT'],
+    'pool_recycle': settings['DB_POOL_RECYCLE'],
+    'pool_pre_ping': settings['DB_POOL_PRE_PING'],
+  }
+  if url.startswith('postgresql') and settings['DB_STATEMENT_TIMEOUT_MS']:
+    # asyncpg takes server settings instead of libpq's options string.
+    options['connect_args'] = {
+      'server_settings': {'statement_timeout': str(settings['DB_STATEMENT_TIMEOUT_MS'])}
+    }
+  return options
+
+class AsyncRequest:
+  def __init__(self, scope):
+    self.method = scope['method']
+    self.path = scope['path']
+    self.args = url_decode(scope['query_string'])
+    self.headers = Headers([
+      (key.decode('latin-1'), value.decode('latin-1')) for key, value in scope['headers']
+    ])
+
+class AsyncAPI:
+  def __init__(self, flask_app):
+    self.flask_app = flask_app
+    self.config = flask_app.config
+    self.fallback = WsgiToAsgi(flask_app)
+
+    options = async_engine_options(self.config)
+    self.engine = create_async_engine(
+      self.config.get('ASYNC_DATABASE_URL') or async_url(self.config['SQLALCHEMY_DATABASE_URI']),
+      **options
+    )
+    self.replicas = [
+      create_async_engine(async_url(self.config['SQLALCHEMY_BINDS'][bind]), **options)
+      for bind in replica_binds(flask_app)
+    ]
+
+    self.url_map = Map([
+      Rule('/api/v1/venues/<int:id>', methods=['GET'], endpoint='api.venue'),
+      Rule('/api/v1/artists/<int:id>', methods=['GET'], endpoint='api.artist'),
+      Rule('/api/v1/venues/search', methods=['GET'], endpoint='api.search_venues'),
+      Rule('/api/v1/artists/search', methods=['GET'], endpoint='api.search_artists'),
+    ])
+    # endpoint -> (handler, model); endpoints are named as in api.py so
+    # both modes hand out the same ETags.
+    self.handlers = {
+      'api.venue': (self.detail, Venue),
+      'api.artist': (self.detail, Artist),
+      'api.search_venues': (self.search, Venue),
+      'api.search_artists': (self.search, Artist),
+    }
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      return await self.lifespan(receive, send)
+    if scope['type'] != 'http' or scope['method'] not in READ_METHODS:
+      return await self.fallback(scope, receive, send)
+    try:
+      endpoint, args = self.url_map.bind('localhost').match(scope['path'], scope['method'])
+    except HTTPException:
+      return await self.fallback(scope, receive, send)
+
+    request = AsyncRequest(scope)
+    try:
+      handler, model = self.handlers[endpoint]
+      async with AsyncSession(self.read_engine(request)) as session:
+        status, body, headers = await handler(session, request, endpoint, model, **args)
+    except Exception:
+      self.flask_app.logger.exception('Exception on %s %s [async]', request.method, request.path)
+      status, body, headers = _error(500)
+    await self.respond(send, request, status, body, headers)
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        for engine in [self.engine, *self.replicas]:
+          await engine.dispose()
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+  def read_engine(self, request):
+    if not self.replicas or self.session_data(request).get('primary_until', 0) >= time.time():
+      return self.engine
+    return random.choice(self.replicas)
+
+  def session_data(self, request):
+    # The Flask session, read from its signed cookie.
+    cookie = parse_cookie(request.headers.get('Cookie', '')).get(self.flask_app.session_cookie_name)
+    serializer = self.flask_app.session_interface.get_signing_serializer(self.flask_app)
+    if not cookie or serializer is None:
+      return {}
+    try:
+      return serializer.loads(
+        cookie, max_age=int(self.flask_app.permanent_session_lifetime.total_seconds())
+      )
+    except BadSignature:
+      return {}
+
+  async def respond(self, send, request, status, body, headers):
+    headers = Headers(headers)
+    if body and status == 200 and request.method != 'HEAD' and self.config['COMPRESS_RESPONSES'] \
+        and len(body) >= self.config['COMPRESS_MIN_SIZE']:
+      headers['Vary'] = 'Accept-Encoding'
+      compressor = choose_compressor(
+        request.headers.get('Accept-Encoding'),
+        self.config['COMPRESS_LEVEL'],
+        self.config['COMPRESS_BROTLI_QUALITY']
+      )
+      if compressor is not None:
+        body = compressor.compress(body, False) + compressor.finish()
+        headers['Content-Encoding'] = compressor.encoding
+    headers['Content-Length'] = str(len(body))
+    await send({
+      'type': 'http.response.start',
+      'status': status,
+      'headers': [
+        (key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in headers.items()
+      ]
+    })
+    await send({'type': 'http.response.body', 'body': b'' if request.method == 'HEAD' else body})
+
+  #  ----------------------------------------------------------------
+  #  Endpoints: (status, body, headers), as api.py answers them.
+  #  ----------------------------------------------------------------
+
+  async def detail(self, session, request, endpoint, model, id):
+    # api.venue() / api.artist() behind @conditional.
+    kind = model.__name__.lower()
+    version = version_of((await session.execute(model.version_statement(id))).first())
+    if version is None:
+      return _error(404)
+    etag = make_etag(self.config.get('ETAG_SALT', ''), endpoint, version)
+    headers = {'ETag': quote_etag(etag, weak=True), 'Cache-Control': 'no-cache'}
+    if version.last_modified is not None:
+      headers['Last-Modified'] = http_date(version.last_modified)
+    if parse_etags(request.headers.get('If-None-Match')).contains_weak(etag):
+      return 304, b'', headers
+
+    fields = parse_fields(request.args.get('fields'))
+    if fields is not None and not fields & SHOW_FIELDS:
+      record = await session.get(model, id, options=[db.selectinload(model.genres)])
+      data = record.format(shows=[]) if record is not None else None
+    else:
+      async def load():
+        rows = (await session.execute(model.detail_statement(id))).all()
+        return model.detail_from_rows(rows)
+      data = await cached_data_async(kind, id, version, load)
+    if data is None:
+      return _error(404)
+    return 200, dumps(select_fields(data, fields)), {**headers, **_JSON}
+
+  async def search(self, session, request, endpoint, model):
+    # api.search_venues() / api.search_artists().
+    words = request.args.get('search_term', '').split()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = self.config['SEARCH_PAGE_SIZE']
+    dialect = session.bind.dialect.name
+    fts = dialect == 'sqlite' and bool(words) \
+      and (await session.execute(fts_exists_statement(model))).first() is not None
+    genre_map = dict((await session.execute(db.select([Genre.name, Genre.id]))).all()) \
+      if words else {}
+
+    count, rows = search_statements(model, words, page, per_page, dialect, fts, genre_map)
+    total = (await session.execute(count)).scalar()
+    rows = (await session.execute(rows)).all()
+    return 200, dumps(search_response(search_result(total, rows, page, per_page))), _JSON
+
+_JSON = {'Content-Type': 'application/json'}
+
+def _error(status):
+  # api._error()'s body.
+  return status, dumps({'error': HTTP_STATUS_CODES[status]}), _JSON
@@ -0,0 +1,168 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datagen import DEFAULT_DATABASE_URL, ROOT, WORDS, load_app
+
+#----------------------------------------------------------------------------#
+# Concurrency benchmark: sync (gunicorn) vs. async (uvicorn) serving.
+#
+#   python benchmarks/concurrency.py --concurrency 1 16 64
+#   python benchmarks/concurrency.py --database-url postgresql://localhost/fyyur_bench
+#
+# Starts each server on an existing benchmark database (see datagen.py) with
+# the same number of worker processes:
+#
+#   sync   gunicorn 'app:create_app()' with --threads threads per worker
+#   async  uvicorn asgi:application (async_api.py)
+#
+# and keeps --concurrency keep-alive clients busy with a seeded mix of
+# /api/v1 venue and artist detail and search requests, reporting throughput
+# and p50/p95/p99 latency. The detail cache is off unless --cache is given,
+# so every request reaches the database. The async mode pays off when
+# requests wait on the network to Postgres; against a local SQLite file
+# there is little waiting to overlap.
+#----------------------------------------------------------------------------#
+
+SERVERS = {
+  'sync': lambda port, args: [
+    sys.executable, '-m', 'gunicorn', 'app:create_app()', '--bind', f'127.0.0.1:{port}',
+    '--workers', str(args.workers), '--threads', str(args.threads), '--log-level', 'warning'
+  ],
+  'async': lambda port, args: [
+    sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', str(port),
+    '--workers', str(args.workers), '--log-level', 'warning'
+  ],
+}
+
+def free_port():
+  with socket.socket() as sock:
+    sock.bind(('127.0.0.1', 0))
+    return sock.getsockname()[1]
+
+def start_server(mode, args):
+  port = free_port()
+  env = dict(os.environ, DATABASE_URL=args.database_url, FYYUR_CACHE_BACKEND=args.cache)
+  process = subprocess.Popen(SERVERS[mode](port, args), cwd=ROOT, env=env)
+  deadline = time.time() + 30
+  while time.time() < deadline:
+    try:
+      connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+      connection.request('GET', '/')
+      connection.getresponse().read()
+      return process, port
+    except OSError:
+      if process.poll() is not None:
+        raise SystemExit(f'{mode} server exited with status {process.returncode}')
+      time.sleep(0.2)
+  process.terminate()
+  raise SystemExit(f'{mode} server did not start')
+
+def request_paths(database_url, count, seed):
+  # The same seeded mix of detail and search paths for every run.
+  app, db = load_app(database_url)
+  with app.app_context():
+    from models import Venue, Artist
+    venue_ids = [id for id, in db.session.query(Venue.id)]
+    artist_ids = [id for id, in db.session.query(Artist.id)]
+  rng = random.Random(seed)
+  kinds = (
+    lambda: f'/api/v1/venues/{rng.choice(venue_ids)}',
+    lambda: f'/api/v1/artists/{rng.choice(artist_ids)}',
+    lambda: f'/api/v1/venues/search?search_term={rng.choice(WORDS).lower()}',
+    lambda: f'/api/v1/artists/search?search_term={rng.choice(WORDS).lower()}',
+  )
+  return [rng.choice(kinds)() for _ in range(count)]
+
+def drive(port, paths, concurrency):
+  # -> (seconds, [latency], errors) with concurrency clients sharing paths.
+  latencies, errors = [], []
+  lock = threading.Lock()
+  pending = iter(paths)
+
+  def client():
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while True:
+      with lock:
+        path = next(pending, None)
+      if path is None:
+        break
+      started = time.perf_counter()
+      try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        status = response.status
+      except (OSError, http.client.HTTPException) as e:
+        connection.close()
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        status = type(e).__name__
+      elapsed = time.perf_counter() - started
+      with lock:
+        latencies.append(elapsed)
+        if status != 200:
+          errors.append(status)
+    connection.close()
+
+  threads = [threading.Thread(target=client) for _ in range(concurrency)]
+  started = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return time.perf_counter() - started, latencies, errors
+
+def percentile(values, fraction):
+  values = sorted(values)
+  return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def main():
+  parser = argparse.ArgumentParser(description='Compare sync and async serving under load.')
+  parser.add_argument('--database-url', default=DEFAULT_DATABASE_URL)
+  parser.add_argument('--modes', nargs='+', choices=sorted(SERVERS), default=['sync', 'async'])
+  parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+  parser.add_argument('--requests', type=int, default=2000, help='Requests per run.')
+  parser.add_argument('--workers', type=int, default=1, help='Server processes.')
+  parser.add_argument('--threads', type=int, default=8, help='Threads per sync worker.')
+  parser.add_argument('--cache', default='none', help='FYYUR_CACHE_BACKEND for the servers.')
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--output', help='Also save the results as JSON.')
+  args = parser.parse_args()
+
+  paths = request_paths(args.database_url, args.requests, args.seed)
+  results = {}
+  for mode in args.modes:
+    process, port = start_server(mode, args)
+    try:
+      drive(port, paths[:200], 8)
+      for concurrency in args.concurrency:
+        seconds, latencies, errors = drive(port, paths, concurrency)
+        result = {
+          'requests_per_second': round(len(latencies) / seconds, 1),
+          'p50_ms': round(statistics.median(latencies) * 1000, 2),
+          'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+          'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+          'errors': len(errors),
+        }
+        results[f'{mode}/{concurrency}'] = result
+        print(f'{mode:6} c={concurrency:<4} {result["requests_per_second"]:8.1f} req/s  '
+              f'p50 {result["p50_ms"]:8.2f}ms  p95 {result["p95_ms"]:8.2f}ms  '
+              f'p99 {result["p99_ms"]:8.2f}ms  {result["errors"]} errors')
+    finally:
+      process.terminate()
+      process.wait()
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+  main()
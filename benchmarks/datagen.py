@@ -0,0 +1,172 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+#----------------------------------------------------------------------------#
+# Seeded synthetic data for the benchmarks.
+#
+#   python benchmarks/datagen.py --scale small
+#
+# The same seed, scale and anchor date always produce the same rows, so runs
+# against different commits are comparable. "full" is the production-sized
+# data set (100k venues, 500k artists, 5M shows). Loads into an empty
+# database: a Postgres schema is built by the migrations, a SQLite file is
+# recreated with create_all(), which only the benchmarks use.
+#----------------------------------------------------------------------------#
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCALES = {
+  'tiny': (200, 1000, 10000),
+  'small': (2000, 10000, 100000),
+  'medium': (20000, 100000, 1000000),
+  'full': (100000, 500000, 5000000),
+}
+
+DEFAULT_DATABASE_URL = 'sqlite:///' + os.path.join(ROOT, 'benchmarks', 'bench.db')
+
+BATCH_SIZE = 10000
+
+WORDS = (
+  'Blue', 'Red', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Silver', 'Crystal',
+  'Neon', 'Lucky', 'Rusty', 'Wild', 'Hidden', 'Broken', 'Paper', 'Iron', 'Moon',
+  'Echo', 'Royal', 'Secret', 'Fox', 'Owl', 'Tiger', 'Lantern', 'Harbor', 'River'
+)
+VENUE_KINDS = ('Hall', 'Lounge', 'Club', 'Room', 'Theater', 'Tavern', 'Garden', 'Stage')
+ARTIST_KINDS = ('Band', 'Collective', 'Trio', 'Quartet', 'Orchestra', 'Project', 'Ensemble')
+CITIES = (
+  ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('New York', 'NY'), ('Brooklyn', 'NY'),
+  ('Austin', 'TX'), ('Houston', 'TX'), ('Chicago', 'IL'), ('Seattle', 'WA'),
+  ('Portland', 'OR'), ('Denver', 'CO'), ('Nashville', 'TN'), ('Atlanta', 'GA'),
+  ('Boston', 'MA'), ('Miami', 'FL'), ('New Orleans', 'LA'), ('Detroit', 'MI')
+)
+
+def load_app(database_url):
+  # Builds the app against database_url instead of config.py's database.
+  sys.path.insert(0, ROOT)
+  os.environ['DATABASE_URL'] = database_url
+  from app import create_app
+  from extensions import db
+  return create_app(), db
+
+def _name(rng, kinds, id):
+  return f'{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(kinds)} {id}'
+
+def _genre_names():
+  from forms import VenueForm
+  return [value for value, _ in VenueForm.genres.kwargs['choices']]
+
+def _insert(db, table, rows):
+  for start in range(0, len(rows), BATCH_SIZE):
+    db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+  db.session.commit()
+
+def create_schema(db):
+  if db.engine.dialect.name == 'postgresql':
+    from flask import current_app
+    from flask_migrate import Migrate, upgrade
+    # load_app() builds the app without Flask-Migrate, as web workers do.
+    Migrate(current_app._get_current_object(), db, directory=os.path.join(ROOT, 'migrations'))
+    upgrade()
+  else:
+    from search import create_fts_tables
+    db.create_all()
+    create_fts_tables(db.session)
+    db.session.commit()
+
+def generate(db, venues, artists, shows, seed=1, anchor=None):
+  from models import Genre, Venue, Artist, Show, VenueArea, venue_genres, artist_genres, \
+    reconcile_show_counts, rollover_shows
+  rng = random.Random(seed)
+  anchor = anchor or datetime.combine(datetime.now().date(), datetime.min.time())
+
+  genres = Genre.resolve(_genre_names())
+  db.session.add_all(genres)
+  db.session.commit()
+  genre_ids = [genre.id for genre in genres]
+
+  def listing(id, kinds):
+    city, state = rng.choice(CITIES)
+    # Ids are left to the database; on an empty table they run 1..n in
+    # insertion order, which the link and show rows rely on.
+    return {
+      'name': _name(rng, kinds, id),
+      'city': city,
+      'state': state,
+      'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+      'facebook_link': f'https://www.facebook.com/{id}',
+    }
+
+  venue_rows = [dict(listing(id, VENUE_KINDS), address=f'{rng.randint(1, 9999)} Main St',
+                     seeking_talent=rng.random() < 0.3)
+                for id in range(1, venues + 1)]
+  _insert(db, Venue.__table__, venue_rows)
+  _insert(db, venue_genres, [
+    {'venue_id': id, 'genre_id': genre_id}
+    for id in range(1, venues + 1)
+    for genre_id in rng.sample(genre_ids, rng.randint(1, 3))
+  ])
+
+  artist_rows = [dict(listing(id, ARTIST_KINDS), seeking_venue=rng.random() < 0.3)
+                 for id in range(1, artists + 1)]
+  _insert(db, Artist.__table__, artist_rows)
+  _insert(db, artist_genres, [
+    {'artist_id': id, 'genre_id': genre_id}
+    for id in range(1, artists + 1)
+    for genre_id in rng.sample(genre_ids, rng.randint(1, 3))
+  ])
+
+  # Shows from a year before the anchor to a year after, in batches so the
+  # full scale never holds 5M dicts at once.
+  for start in range(0, shows, BATCH_SIZE):
+    db.session.execute(Show.__table__.insert(), [{
+      'venue_id': rng.randint(1, venues),
+      'artist_id': rng.randint(1, artists),
+      'start_time': anchor + timedelta(hours=rng.randint(-365 * 24, 365 * 24))
+    } for _ in range(start, min(start + BATCH_SIZE, shows))])
+    db.session.commit()
+
+  # The Core inserts skip the VenueAreas events; summarise in one go.
+  VenueArea.rebuild()
+  # The shows were inserted without touch_parents(), so count them now.
+  rollover_shows(db.session.connection())
+  reconcile_show_counts(db.session.connection())
+  db.session.commit()
+  if db.engine.dialect.name == 'postgresql':
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+def dataset_size(db):
+  from models import Venue, Artist, Show
+  return {
+    'venues': db.session.query(db.func.count(Venue.id)).scalar(),
+    'artists': db.session.query(db.func.count(Artist.id)).scalar(),
+    'shows': db.session.query(db.func.count(Show.id)).scalar(),
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description='Generate the benchmark data set.')
+  parser.add_argument('--database-url', default=DEFAULT_DATABASE_URL)
+  parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--anchor', type=datetime.fromisoformat,
+                      help='Shows are spread a year either side of this date (default: today).')
+  args = parser.parse_args()
+
+  if args.database_url.startswith('sqlite:///'):
+    path = args.database_url[len('sqlite:///'):]
+    if os.path.exists(path):
+      os.remove(path)
+
+  app, db = load_app(args.database_url)
+  started = time.perf_counter()
+  with app.app_context():
+    create_schema(db)
+    generate(db, *SCALES[args.scale], seed=args.seed, anchor=args.anchor)
+    print(dataset_size(db), f'in {time.perf_counter() - started:.1f}s')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datagen import SCALES, load_app, create_schema, generate, dataset_size
+
+#----------------------------------------------------------------------------#
+# Query plan check against seeded data.
+#
+#   python benchmarks/plans.py
+#   python benchmarks/plans.py --scale small
+#   python benchmarks/plans.py --database-url postgresql://localhost/fyyur_plans
+#
+# Seeds a fresh database with datagen.py, runs ANALYZE so the planner has
+# real statistics, and fails (exit status 1) if any of the hot queries in
+# query_plans.main_queries() scans a whole table. Without --database-url
+# the data goes to a temporary SQLite file; a given database must be empty.
+#----------------------------------------------------------------------------#
+
+def check(database_url, scale, seed):
+  app, db = load_app(database_url)
+  with app.app_context():
+    from query_plans import assert_no_sequential_scans
+    started = time.perf_counter()
+    create_schema(db)
+    generate(db, *SCALES[scale], seed=seed)
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    print(dataset_size(db), f'seeded in {time.perf_counter() - started:.1f}s')
+    assert_no_sequential_scans()
+
+def main():
+  parser = argparse.ArgumentParser(description='Check the hot query plans on seeded data.')
+  parser.add_argument('--database-url', help='An empty database (default: a temporary SQLite file).')
+  parser.add_argument('--scale', choices=sorted(SCALES), default='tiny')
+  parser.add_argument('--seed', type=int, default=1)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    database_url = args.database_url or 'sqlite:///' + os.path.join(directory, 'plans.db')
+    try:
+      check(database_url, args.scale, args.seed)
+    except AssertionError as e:
+      print(e)
+      raise SystemExit(1)
+  print('All checked queries use indexes.')
+
+if __name__ == '__main__':
+  main()
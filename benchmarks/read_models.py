@@ -0,0 +1,157 @@
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datagen import DEFAULT_DATABASE_URL, load_app
+
+#----------------------------------------------------------------------------#
+# Listing page build cost: ORM entities vs. row dicts vs. read models.
+#
+#   python benchmarks/read_models.py --per-page 50 500
+#
+# Builds and renders one page of /artists, /venues (one area) and /shows
+# three ways against an existing benchmark database (see datagen.py):
+#
+#   orm          full ORM instances copied into dicts
+#   rows         column-projection rows copied into dicts
+#   read_models  column-projection rows copied into read_models tuples,
+#                as the views do
+#
+# and reports the median time per page and the peak Python allocation.
+#----------------------------------------------------------------------------#
+
+def paths(db, per_page):
+  # listing -> (request path, template, context name, {path: build()})
+  from flask import request
+  from sqlalchemy.orm import joinedload
+  from models import Venue, Artist, Show
+  from pagination import seek_query
+  from read_models import ArtistItem, VenueItem, ShowItem
+
+  def page(query, key, descending=False):
+    return seek_query(query, key, None, per_page, descending).all()
+
+  def venues(query):
+    city, state = request.args['city'], request.args['state']
+    return page(query.filter(Venue.city == city, Venue.state == state), Venue.listing_key())
+
+  def venue_areas(venues):
+    return [{'city': request.args['city'], 'state': request.args['state'],
+             'count': None, 'venues': venues}]
+
+  def show_dict(show):
+    return {
+      'venue_id': show.venue_id,
+      'venue_name': show.venue.name,
+      'artist_id': show.artist_id,
+      'artist_name': show.artist.name,
+      'artist_image_link': show.artist.image_link,
+      'start_time': show.start_time
+    }
+
+  def show_row_dict(row):
+    return {
+      'venue_id': row.venue_id,
+      'venue_name': row.venue_name,
+      'artist_id': row.artist_id,
+      'artist_name': row.artist_name,
+      'artist_image_link': row.artist_image_link,
+      'start_time': row.start_time
+    }
+
+  shows_key = Show.listing_key()
+  return {
+    'artists': ('/artists', 'pages/artists.html', 'artists', {
+      'orm': lambda: [{'id': artist.id, 'name': artist.name}
+                      for artist in page(Artist.query, Artist.listing_key())],
+      'rows': lambda: [{'id': row.id, 'name': row.name}
+                       for row in page(Artist.listing_query(), Artist.listing_key())],
+      'read_models': lambda: list(map(ArtistItem._make,
+                                      page(Artist.listing_query(), Artist.listing_key()))),
+    }),
+    'venues': ('/venues', 'pages/venues.html', 'areas', {
+      'orm': lambda: venue_areas([{'id': venue.id, 'name': venue.name}
+                                  for venue in venues(Venue.query)]),
+      'rows': lambda: venue_areas([{'id': row.id, 'name': row.name}
+                                   for row in venues(Venue.listing_query())]),
+      'read_models': lambda: venue_areas(list(map(VenueItem._make,
+                                                  venues(Venue.listing_query())))),
+    }),
+    'shows': ('/shows', 'pages/shows.html', 'shows', {
+      'orm': lambda: [show_dict(show) for show in page(
+        Show.query.options(joinedload(Show.venue), joinedload(Show.artist))
+          .filter(Show.start_time.isnot(None)),
+        shows_key, descending=True
+      )],
+      'rows': lambda: [show_row_dict(row)
+                       for row in page(Show.listing_query(), shows_key, descending=True)],
+      'read_models': lambda: list(map(ShowItem._make,
+                                      page(Show.listing_query(), shows_key, descending=True))),
+    }),
+  }
+
+def measure(app, db, url, template, name, build, repeats):
+  from flask import render_template
+  from pagination import Page
+
+  def once():
+    html = render_template(template, **{name: build()}, page=Page([]))
+    db.session.remove()
+    return html
+
+  with app.test_request_context(url):
+    for _ in range(3):
+      once()
+    gc.collect()
+    timings = []
+    for _ in range(repeats):
+      started = time.perf_counter()
+      once()
+      timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    once()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+  return {
+    'median_ms': round(statistics.median(timings) * 1000, 3),
+    'peak_alloc_kb': round(peak / 1024, 1)
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description='Compare listing page build paths.')
+  parser.add_argument('--database-url', default=DEFAULT_DATABASE_URL)
+  parser.add_argument('--per-page', type=int, nargs='+', default=[50, 500])
+  parser.add_argument('--repeats', type=int, default=50)
+  parser.add_argument('--output', help='Also save the results as JSON.')
+  args = parser.parse_args()
+
+  app, db = load_app(args.database_url)
+  results = {}
+  with app.app_context():
+    from models import Venue
+    city, state = db.session.query(Venue.city, Venue.state) \
+      .group_by(Venue.city, Venue.state) \
+      .order_by(db.func.count(Venue.id).desc()) \
+      .first()
+    for per_page in args.per_page:
+      for listing, (url, template, name, builds) in paths(db, per_page).items():
+        if listing == 'venues':
+          url = f'{url}?city={city}&state={state}'
+        for path, build in builds.items():
+          result = measure(app, db, url, template, name, build, args.repeats)
+          results[f'{listing}/{per_page}/{path}'] = result
+          print(f'{listing:8} {per_page:5} {path:12} {result["median_ms"]:9.3f}ms '
+                f'{result["peak_alloc_kb"]:9.1f} KiB peak')
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,239 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datagen import DEFAULT_DATABASE_URL, ROOT, SCALES, WORDS, load_app, create_schema, \
+  generate, dataset_size
+
+#----------------------------------------------------------------------------#
+# Benchmarks for the hot routes.
+#
+#   python benchmarks/run.py --generate small
+#   python benchmarks/run.py --compare benchmarks/results/a.json benchmarks/results/b.json
+#
+# Drives each scenario through the Flask test client and records p50/p95/p99
+# latency, SQL statements per request and memory: the process RSS, and with
+# --trace-memory the peak Python allocation per request. Results are written
+# to benchmarks/results/<commit>-<time>.json.
+#----------------------------------------------------------------------------#
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+class QueryCounter:
+  def __init__(self, engine):
+    self.count = 0
+    event.listen(engine, 'before_cursor_execute', self._count)
+
+  def _count(self, *args):
+    self.count += 1
+
+def _ids(db, model):
+  return [id for id, in db.session.query(model.id)]
+
+def scenarios(db, rng):
+  # name -> callable(client) returning a response; ids and search terms are
+  # drawn from the seeded rng so every run issues the same requests.
+  from models import Venue, Artist
+  venue_ids, artist_ids = _ids(db, Venue), _ids(db, Artist)
+  start = datetime.now() + timedelta(days=30)
+
+  def venue_form(client):
+    city = rng.choice(('Austin', 'Chicago', 'Denver'))
+    return client.post('/venues/create', data={
+      'name': f'Bench Venue {rng.random()}', 'city': city, 'state': 'TX',
+      'address': '1 Main St', 'phone': '555-555-5555', 'genres': ['Jazz', 'Blues'],
+      'facebook_link': 'https://www.facebook.com/bench', 'image_link': '',
+      'website_link': '', 'seeking_description': ''
+    })
+
+  def artist_form(client):
+    return client.post('/artists/create', data={
+      'name': f'Bench Artist {rng.random()}', 'city': 'Austin', 'state': 'TX',
+      'phone': '555-555-5555', 'genres': ['Rock n Roll'],
+      'facebook_link': 'https://www.facebook.com/bench', 'image_link': '',
+      'website_link': '', 'seeking_description': ''
+    })
+
+  def show_form(client):
+    return client.post('/shows/create', data={
+      'artist_id': rng.choice(artist_ids), 'venue_id': rng.choice(venue_ids),
+      'start_time': (start + timedelta(hours=rng.randint(0, 5000))).strftime('%Y-%m-%d %H:%M:%S')
+    })
+
+  return {
+    'venues index': lambda client: client.get('/venues'),
+    'venue detail': lambda client: client.get(f'/venues/{rng.choice(venue_ids)}'),
+    'artist search': lambda client: client.get(
+      '/artists/search', query_string={'search_term': rng.choice(WORDS).lower()}
+    ),
+    'shows listing': lambda client: client.get('/shows'),
+    'create venue': venue_form,
+    'create artist': artist_form,
+    'create show': show_form,
+  }
+
+def _percentile(quantiles, p):
+  return round(quantiles[p - 1] * 1000, 3)
+
+def _send(client, request):
+  # Streamed pages (STREAM_TEMPLATES) render while their body is read, so
+  # the body is read and the response closed inside the timed region.
+  response = request(client)
+  response.get_data()
+  response.close()
+  return response
+
+def run_scenario(client, request, counter, requests, warmup, trace_memory):
+  for _ in range(warmup):
+    _send(client, request)
+
+  latencies, queries, statuses, peaks = [], [], {}, []
+  for _ in range(requests):
+    if trace_memory:
+      tracemalloc.reset_peak()
+    counter.count = 0
+    started = time.perf_counter()
+    response = _send(client, request)
+    latencies.append(time.perf_counter() - started)
+    queries.append(counter.count)
+    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    if trace_memory:
+      peaks.append(tracemalloc.get_traced_memory()[1])
+
+  quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+  result = {
+    'requests': requests,
+    'p50_ms': _percentile(quantiles, 50),
+    'p95_ms': _percentile(quantiles, 95),
+    'p99_ms': _percentile(quantiles, 99),
+    'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+    'queries_per_request': round(statistics.mean(queries), 2),
+    'max_queries': max(queries),
+    'statuses': {str(status): count for status, count in sorted(statuses.items())},
+  }
+  if peaks:
+    result['peak_alloc_kb'] = round(max(peaks) / 1024, 1)
+  return result
+
+def _rss_mb():
+  # ru_maxrss is in KiB on Linux and bytes on macOS.
+  rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def _commit():
+  try:
+    return subprocess.check_output(
+      ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL
+    ).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return 'unknown'
+
+def run(args):
+  if args.generate and args.database_url.startswith('sqlite:///'):
+    path = args.database_url[len('sqlite:///'):]
+    if os.path.exists(path):
+      os.remove(path)
+
+  app, db = load_app(args.database_url)
+  app.config['WTF_CSRF_ENABLED'] = False
+  if args.no_cache:
+    import cache
+    cache.cache = cache.NullCache()
+
+  with app.app_context():
+    if args.generate:
+      create_schema(db)
+      generate(db, *SCALES[args.generate], seed=args.seed)
+    size = dataset_size(db)
+    rng = random.Random(args.seed)
+    selected = scenarios(db, rng)
+    counter = QueryCounter(db.engine)
+
+  if args.only:
+    selected = {name: request for name, request in selected.items() if name in args.only}
+
+  client = app.test_client()
+  if args.trace_memory:
+    tracemalloc.start()
+  results = {}
+  for name, request in selected.items():
+    gc.collect()
+    results[name] = run_scenario(
+      client, request, counter, args.requests, args.warmup, args.trace_memory
+    )
+    print(f'{name:16} p50 {results[name]["p50_ms"]:8.2f}ms  p95 {results[name]["p95_ms"]:8.2f}ms  '
+          f'p99 {results[name]["p99_ms"]:8.2f}ms  {results[name]["queries_per_request"]:6.2f} queries')
+
+  report = {
+    'commit': _commit(),
+    'timestamp': datetime.now().isoformat(timespec='seconds'),
+    'python': platform.python_version(),
+    'database': db.get_engine(app).dialect.name,
+    'dataset': size,
+    'seed': args.seed,
+    'requests': args.requests,
+    'cache': not args.no_cache,
+    'max_rss_mb': _rss_mb(),
+    'scenarios': results,
+  }
+  output = args.output or os.path.join(
+    RESULTS_DIR, f'{report["commit"]}-{datetime.now():%Y%m%d%H%M%S}.json'
+  )
+  os.makedirs(os.path.dirname(output), exist_ok=True)
+  with open(output, 'w') as file:
+    json.dump(report, file, indent=2)
+  print(f'max RSS {report["max_rss_mb"]} MB; saved {output}')
+
+def compare(before_path, after_path):
+  # Per-scenario change of the after run relative to the before run.
+  with open(before_path) as file:
+    before = json.load(file)
+  with open(after_path) as file:
+    after = json.load(file)
+  print(f'{before["commit"]} -> {after["commit"]}')
+  for name, result in after['scenarios'].items():
+    base = before['scenarios'].get(name)
+    if base is None:
+      continue
+    changes = []
+    for key in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request'):
+      change = (result[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+      changes.append(f'{key} {base[key]} -> {result[key]} ({change:+.1f}%)')
+    print(f'{name:16} ' + '  '.join(changes))
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark the hot routes.')
+  parser.add_argument('--database-url', default=DEFAULT_DATABASE_URL)
+  parser.add_argument('--generate', choices=sorted(SCALES),
+                      help='Recreate the data set at this scale before running.')
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario.')
+  parser.add_argument('--warmup', type=int, default=10)
+  parser.add_argument('--only', nargs='+', metavar='SCENARIO')
+  parser.add_argument('--no-cache', action='store_true', help='Bypass the detail page cache.')
+  parser.add_argument('--trace-memory', action='store_true',
+                      help='Record peak Python allocations per request (slower).')
+  parser.add_argument('--output', help='Result file (default: benchmarks/results/<commit>-<time>.json).')
+  parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+  args = parser.parse_args()
+
+  if args.compare:
+    compare(*args.compare)
+  else:
+    run(args)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+from datagen import DEFAULT_DATABASE_URL, ROOT
+
+#----------------------------------------------------------------------------#
+# Cold start benchmark.
+#
+#   python benchmarks/startup.py --runs 20
+#
+# Starts a fresh interpreter per run, as a new worker or test process would,
+# and times importing app, creating the application and serving the first
+# request (the home page, which needs no database). The database URL may
+# point at a server that is not running: boot should not need it.
+#----------------------------------------------------------------------------#
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+app = module.create_app() if hasattr(module, 'create_app') else module.app
+created = time.perf_counter()
+status = app.test_client().get('/').status_code
+served = time.perf_counter()
+print(json.dumps({
+  'import_ms': (imported - started) * 1000,
+  'create_ms': (created - imported) * 1000,
+  'first_request_ms': (served - created) * 1000,
+  'total_ms': (served - started) * 1000,
+  'modules': len(sys.modules),
+  'status': status
+}))
+'''
+
+def probe(database_url):
+  env = dict(os.environ, DATABASE_URL=database_url)
+  output = subprocess.run(
+    [sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True, text=True
+  )
+  if output.returncode:
+    lines = output.stderr.strip().splitlines() or ['exit status %d' % output.returncode]
+    return {'error': next((line for line in reversed(lines) if 'Error' in line), lines[-1])}
+  return json.loads(output.stdout.strip().splitlines()[-1])
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark app cold start.')
+  parser.add_argument('--database-url', default=DEFAULT_DATABASE_URL)
+  parser.add_argument('--runs', type=int, default=10)
+  parser.add_argument('--output', help='Also save the summary as JSON.')
+  args = parser.parse_args()
+
+  runs = [probe(args.database_url) for _ in range(args.runs)]
+  failures = [run['error'] for run in runs if 'error' in run]
+  runs = [run for run in runs if 'error' not in run]
+  summary = {
+    'timestamp': datetime.now().isoformat(timespec='seconds'),
+    'database_url': args.database_url,
+    'runs': len(runs),
+    'failures': failures[:1] + (['...'] if len(failures) > 1 else []),
+  }
+  if runs:
+    for key in ('import_ms', 'create_ms', 'first_request_ms', 'total_ms'):
+      summary[key] = round(statistics.median(run[key] for run in runs), 1)
+    summary['modules'] = runs[-1]['modules']
+    summary['status'] = runs[-1]['status']
+  print(json.dumps(summary, indent=2))
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump(summary, file, indent=2)
+
+if __name__ == '__main__':
+  main()
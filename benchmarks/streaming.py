@@ -0,0 +1,115 @@
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from werkzeug.test import EnvironBuilder
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datagen import DEFAULT_DATABASE_URL, load_app
+
+#----------------------------------------------------------------------------#
+# Time to first byte and peak memory of the large listing pages.
+#
+#   python benchmarks/streaming.py --per-page 50 500 2000
+#
+# Requests /shows, /artists and /venues (one area) through the full WSGI
+# stack, compression middleware included, against an existing benchmark
+# database (see datagen.py), with every combination of
+#
+#   buffered / streamed   STREAM_TEMPLATES off / on
+#   identity / gzip       the Accept-Encoding sent
+#
+# and reports the median time to the first body byte and to the last, the
+# bytes sent and the peak Python allocation while serving one request.
+#----------------------------------------------------------------------------#
+
+MODES = {
+  'buffered': False,
+  'streamed': True,
+}
+
+ENCODINGS = {
+  'identity': 'identity',
+  'gzip': 'gzip',
+}
+
+def serve(app, url, encoding):
+  # -> (seconds to first body byte, seconds to last, bytes sent)
+  environ = EnvironBuilder(url, headers={'Accept-Encoding': encoding}).get_environ()
+  started = time.perf_counter()
+  first = None
+  sent = 0
+  body = app(environ, lambda status, headers, exc_info=None: None)
+  try:
+    for chunk in body:
+      if chunk and first is None:
+        first = time.perf_counter()
+      sent += len(chunk)
+  finally:
+    if hasattr(body, 'close'):
+      body.close()
+  return first - started, time.perf_counter() - started, sent
+
+def measure(app, url, encoding, repeats):
+  for _ in range(3):
+    serve(app, url, encoding)
+  gc.collect()
+  runs = [serve(app, url, encoding) for _ in range(repeats)]
+
+  tracemalloc.start()
+  serve(app, url, encoding)
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return {
+    'ttfb_ms': round(statistics.median(run[0] for run in runs) * 1000, 3),
+    'total_ms': round(statistics.median(run[1] for run in runs) * 1000, 3),
+    'bytes': runs[-1][2],
+    'peak_alloc_kb': round(peak / 1024, 1)
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description='Compare buffered and streamed listing pages.')
+  parser.add_argument('--database-url', default=DEFAULT_DATABASE_URL)
+  parser.add_argument('--per-page', type=int, nargs='+', default=[50, 500, 2000])
+  parser.add_argument('--repeats', type=int, default=20)
+  parser.add_argument('--output', help='Also save the results as JSON.')
+  args = parser.parse_args()
+
+  app, db = load_app(args.database_url)
+  if not app.config['COMPRESS_RESPONSES']:
+    print('COMPRESS_RESPONSES is off: gzip runs are sent uncompressed.')
+  with app.app_context():
+    from models import Venue
+    city, state = db.session.query(Venue.city, Venue.state) \
+      .group_by(Venue.city, Venue.state) \
+      .order_by(db.func.count(Venue.id).desc()) \
+      .first()
+  urls = {
+    'shows': '/shows',
+    'artists': '/artists',
+    'venues': f'/venues?city={city}&state={state}',
+  }
+
+  results = {}
+  for per_page in args.per_page:
+    app.config['PAGE_SIZE'] = per_page
+    for listing, url in urls.items():
+      for mode, streamed in MODES.items():
+        app.config['STREAM_TEMPLATES'] = streamed
+        for encoding, accept in ENCODINGS.items():
+          result = measure(app, url, accept, args.repeats)
+          results[f'{listing}/{per_page}/{mode}/{encoding}'] = result
+          print(f'{listing:8} {per_page:5} {mode:9} {encoding:9} '
+                f'ttfb {result["ttfb_ms"]:8.2f}ms  total {result["total_ms"]:8.2f}ms  '
+                f'{result["bytes"] / 1024:8.1f} KiB  {result["peak_alloc_kb"]:8.1f} KiB peak')
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+  main()
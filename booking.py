@@ -0,0 +1,225 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import values
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import Values
+
+from extensions import db
+from models import Venue, Artist, Show, touch_parents
+
+#----------------------------------------------------------------------------#
+# Show booking.
+#
+# Each show is listed with a single INSERT ... SELECT ... WHERE NOT EXISTS:
+# the artist's other bookings within SHOW_BOOKING_GAP_MINUTES of the start
+# time are checked in the same statement (an index range scan on
+# ix_shows_artist_id_start_time), the foreign keys reject unknown artists and
+# venues, and uq_shows_artist_id_venue_id_start_time rejects a duplicate that
+# races past the check. Two overlapping bookings of one artist at different
+# venues committed at the same instant can still both pass under READ
+# COMMITTED; exact duplicates cannot.
+#
+# A tour is booked in one transaction and is listed whole or not at all.
+# Imports book a whole batch at once (insert_show_batch): clashes within the
+# batch are found in Python, and one INSERT ... SELECT over the batch's
+# VALUES skips the shows that clash with rows already listed.
+#----------------------------------------------------------------------------#
+
+class BookingError(Exception):
+  # The message is shown to the user as is; index is the position of the
+  # show in a tour and status the HTTP status the API answers with.
+  def __init__(self, message, index=0, status=409):
+    super().__init__(message)
+    self.index = index
+    self.status = status
+
+def parse_show(item, index=0):
+  # Checks one submitted show: integer ids and an ISO 8601 start time.
+  if not isinstance(item, dict):
+    raise BookingError('Each show must be an object.', index, 422)
+  show = {}
+  for key in ('artist_id', 'venue_id'):
+    try:
+      show[key] = int(item.get(key))
+    except (TypeError, ValueError):
+      raise BookingError(f'{key} must be an integer.', index, 422)
+  start_time = item.get('start_time')
+  try:
+    show['start_time'] = start_time if isinstance(start_time, datetime) \
+      else datetime.fromisoformat(str(start_time).strip())
+  except ValueError:
+    raise BookingError('start_time must be an ISO 8601 date and time.', index, 422)
+  return show
+
+def _insert(show, gap, now):
+  shows = Show.__table__
+  clash = db.select([shows.c.id]) \
+    .where(shows.c.artist_id == show['artist_id']) \
+    .where(shows.c.start_time > show['start_time'] - gap) \
+    .where(shows.c.start_time < show['start_time'] + gap) \
+    .exists()
+  values = db.select([
+    db.literal(show['artist_id'], shows.c.artist_id.type),
+    db.literal(show['venue_id'], shows.c.venue_id.type),
+    db.literal(show['start_time'], shows.c.start_time.type),
+    db.literal(now, shows.c.updated_at.type)
+  ]).where(~clash)
+  return shows.insert().from_select(['artist_id', 'venue_id', 'start_time', 'updated_at'], values)
+
+def _gap_error(show, gap_minutes, index):
+  return BookingError(
+    f"Artist ID {show['artist_id']} already has a show within "
+    f"{gap_minutes} minutes of {show['start_time']:%Y-%m-%d %H:%M}.", index
+  )
+
+def _integrity_error(error, show, index):
+  # Runs after the rollback, so a missing-record lookup is safe on Postgres.
+  if 'unique' in str(error.orig).lower():
+    return BookingError('This show is already listed.', index)
+  for model, key in ((Artist, 'artist_id'), (Venue, 'venue_id')):
+    if db.session.query(model.id).filter(model.id == show[key]).first() is None:
+      return BookingError(f'{model.__name__} ID {show[key]} does not exist', index, 422)
+  return BookingError('The show could not be listed.', index)
+
+def _listed(show):
+  shows = Show.__table__
+  return db.session.query(shows.c.id).filter(
+    shows.c.artist_id == show['artist_id'],
+    shows.c.venue_id == show['venue_id'],
+    shows.c.start_time == show['start_time']
+  ).first() is not None
+
+def insert_shows(shows, gap_minutes):
+  # Inserts the parsed shows without committing; rolls back and raises
+  # BookingError naming the first show that could not be listed. The
+  # importer writes its show batches through this as well.
+  gap = timedelta(minutes=gap_minutes)
+  now = datetime.utcnow()
+  for index, show in enumerate(shows):
+    try:
+      booked = db.session.execute(_insert(show, gap, now)).rowcount
+    except IntegrityError as e:
+      db.session.rollback()
+      raise _integrity_error(e, show, index)
+    if not booked:
+      # The clash check also matches the show itself.
+      error = BookingError('This show is already listed.', index) if _listed(show) \
+        else _gap_error(show, gap_minutes, index)
+      db.session.rollback()
+      raise error
+
+@compiles(Values, 'sqlite')
+def _compile_sqlite_values(element, compiler, asfrom=False, **kw):
+  # SQLite cannot name the columns of an aliased VALUES list; it calls them
+  # column1, column2, ..., so they are renamed in a subquery.
+  rows = compiler.visit_values(element, **kw)
+  if not asfrom:
+    return rows
+  quote = compiler.preparer.quote
+  columns = ', '.join(
+    f'column{number} AS {quote(column.name)}'
+    for number, column in enumerate(element.columns, start=1)
+  )
+  return f'(SELECT {columns} FROM ({rows})) AS {quote(element.name)}'
+
+def _batch_clashes(shows, gap_minutes):
+  # {position: BookingError} for the shows that clash with an earlier one
+  # of the same batch, found by walking each artist's shows in time order.
+  gap = timedelta(minutes=gap_minutes)
+  rejected, latest, listed = {}, {}, set()
+  order = sorted(range(len(shows)), key=lambda p: (shows[p]['artist_id'], shows[p]['start_time'], p))
+  for position in order:
+    show = shows[position]
+    key = (show['artist_id'], show['venue_id'], show['start_time'])
+    previous = latest.get(show['artist_id'])
+    if key in listed:
+      rejected[position] = BookingError('This show is already listed.', position)
+    elif previous is not None and show['start_time'] - previous < gap:
+      rejected[position] = _gap_error(show, gap_minutes, position)
+    else:
+      listed.add(key)
+      latest[show['artist_id']] = show['start_time']
+  return rejected
+
+def insert_show_batch(shows, gap_minutes):
+  # Inserts the parsed shows that clash with nothing, in one statement,
+  # without committing; -> {position: BookingError} for the shows left out.
+  gap = timedelta(minutes=gap_minutes)
+  rejected = _batch_clashes(shows, gap_minutes)
+  candidates = [(position, show) for position, show in enumerate(shows) if position not in rejected]
+  if not candidates:
+    return rejected
+
+  shows_table = Show.__table__
+  # The clash window is computed here, as date arithmetic differs between
+  # the dialects.
+  batch = values(
+    db.column('position', db.Integer),
+    db.column('artist_id', db.Integer),
+    db.column('venue_id', db.Integer),
+    db.column('start_time', db.DateTime),
+    db.column('window_start', db.DateTime),
+    db.column('window_end', db.DateTime),
+    name='batch'
+  ).data([(
+    position, show['artist_id'], show['venue_id'], show['start_time'],
+    show['start_time'] - gap, show['start_time'] + gap
+  ) for position, show in candidates])
+  clash = db.select([shows_table.c.id]) \
+    .where(shows_table.c.artist_id == batch.c.artist_id) \
+    .where(shows_table.c.start_time > batch.c.window_start) \
+    .where(shows_table.c.start_time < batch.c.window_end) \
+    .exists()
+  insert = shows_table.insert().from_select(
+    ['artist_id', 'venue_id', 'start_time', 'updated_at'],
+    db.select([
+      batch.c.artist_id, batch.c.venue_id, batch.c.start_time,
+      db.literal(datetime.utcnow(), shows_table.c.updated_at.type)
+    ]).where(~clash)
+  )
+
+  connection = db.session.connection()
+  if connection.dialect.full_returning:
+    inserted = {
+      (artist_id, start_time) for artist_id, start_time in
+      connection.execute(insert.returning(shows_table.c.artist_id, shows_table.c.start_time))
+    }
+    clashing = [
+      (position, show) for position, show in candidates
+      if (show['artist_id'], show['start_time']) not in inserted
+    ]
+  else:
+    # SQLAlchemy 1.4 has no RETURNING for SQLite: the same clash check
+    # picks out the rejected shows first. A concurrent booking between the
+    # two statements shows up as a short count.
+    positions = {position for position, in connection.execute(
+      db.select([batch.c.position]).where(clash)
+    )}
+    clashing = [(position, show) for position, show in candidates if position in positions]
+    if connection.execute(insert).rowcount != len(candidates) - len(clashing):
+      raise BookingError('Shows were listed concurrently.')
+
+  if clashing:
+    listed = {tuple(row) for row in db.session.query(
+      shows_table.c.artist_id, shows_table.c.venue_id, shows_table.c.start_time
+    ).filter(db.tuple_(
+      shows_table.c.artist_id, shows_table.c.venue_id, shows_table.c.start_time
+    ).in_([(show['artist_id'], show['venue_id'], show['start_time']) for _, show in clashing]))}
+    for position, show in clashing:
+      rejected[position] = BookingError('This show is already listed.', position) \
+        if (show['artist_id'], show['venue_id'], show['start_time']) in listed \
+        else _gap_error(show, gap_minutes, position)
+  return rejected
+
+def book_shows(shows, gap_minutes):
+  # Lists the parsed shows in one transaction; raises BookingError naming
+  # the first show that could not be listed.
+  insert_shows(shows, gap_minutes)
+  touch_parents(
+    db.session.connection(),
+    [show['venue_id'] for show in shows],
+    [show['artist_id'] for show in shows]
+  )
+  db.session.commit()
+  return len(shows)
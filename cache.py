@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import session
+
+#----------------------------------------------------------------------------#
+# Read-through cache for venue and artist detail pages.
+#
+# Both the format() dict and the rendered HTML are cached under
+# 'venue:<id>:<version>' / 'artist:<id>:<version>' keys (the HTML with an
+# ':html' suffix), where version is a hash of the record's Version -- the
+# one its ETag is made from (see conditional.py). A write moves the version,
+# so the next request misses and a cached body always matches the ETag it
+# is sent with, whichever worker handled the write; no invalidation is
+# needed and superseded entries age out of the LRU or expire. Entries never
+# outlive the start of their earliest upcoming show, after which that show
+# belongs under "past".
+#----------------------------------------------------------------------------#
+
+class CacheStats:
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def record(self, hit):
+    with self._lock:
+      if hit:
+        self.hits += 1
+      else:
+        self.misses += 1
+
+  def as_dict(self):
+    lookups = self.hits + self.misses
+    return {
+      'hits': self.hits,
+      'misses': self.misses,
+      'hit_rate': self.hits / lookups if lookups else 0.0
+    }
+
+class NullCache:
+  def __init__(self):
+    self.stats = CacheStats()
+
+  def get(self, key):
+    self.stats.record(False)
+    return None
+
+  def set(self, key, value, ttl):
+    pass
+
+  def delete(self, *keys):
+    pass
+
+  def clear(self):
+    pass
+
+class LRUCache:
+  # Bounded, thread-safe LRU with a per-entry expiry time.
+  def __init__(self, max_entries=2048):
+    self.max_entries = max_entries
+    self.stats = CacheStats()
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and entry[0] <= time.monotonic():
+        del self._entries[key]
+        entry = None
+      if entry is not None:
+        self._entries.move_to_end(key)
+    self.stats.record(entry is not None)
+    return entry[1] if entry is not None else None
+
+  def set(self, key, value, ttl):
+    with self._lock:
+      self._entries[key] = (time.monotonic() + ttl, value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def delete(self, *keys):
+    with self._lock:
+      for key in keys:
+        self._entries.pop(key, None)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+class RedisCache:
+  # Shared cache for multi-worker deployments; needs the redis package.
+  def __init__(self, url, prefix='fyyur:'):
+    import redis
+    self.client = redis.Redis.from_url(url)
+    self.prefix = prefix
+    self.stats = CacheStats()
+
+  def get(self, key):
+    value = self.client.get(self.prefix + key)
+    self.stats.record(value is not None)
+    return pickle.loads(value) if value is not None else None
+
+  def set(self, key, value, ttl):
+    self.client.set(self.prefix + key, pickle.dumps(value), ex=max(int(ttl), 1))
+
+  def delete(self, *keys):
+    if keys:
+      self.client.delete(*(self.prefix + key for key in keys))
+
+  def clear(self):
+    keys = list(self.client.scan_iter(self.prefix + '*'))
+    if keys:
+      self.client.delete(*keys)
+
+cache = NullCache()
+default_ttl = 300
+
+def init_cache(app):
+  global cache, default_ttl
+  backend = app.config.get('CACHE_BACKEND', 'memory')
+  if backend == 'memory':
+    cache = LRUCache(app.config.get('CACHE_MAX_ENTRIES', 2048))
+  elif backend == 'redis':
+    cache = RedisCache(app.config['CACHE_REDIS_URL'])
+  else:
+    cache = NullCache()
+  default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+  return cache
+
+def detail_key(kind, id, version):
+  tag = hashlib.sha1(repr(version.key).encode()).hexdigest()[:16]
+  return f'{kind}:{id}:{tag}'
+
+def _ttl(data):
+  # Expire no later than the first upcoming show, which turns into a past
+  # show at its start time.
+  ttl = default_ttl
+  if data['upcoming_shows']:
+    starts = data['upcoming_shows'][0]['start_time']
+    if isinstance(starts, str):
+      # Entries stored by Redis before start times were kept as datetimes.
+      starts = datetime.fromisoformat(starts)
+    ttl = min(ttl, (starts - datetime.now()).total_seconds())
+  return ttl
+
+def cached_data(kind, id, version, load):
+  # The format() dict, from the cache or from load(); None for a missing
+  # record. Shared by the HTML pages and the JSON API. Without a version
+  # (no such record) nothing is cached.
+  if version is None:
+    return load()
+  key = detail_key(kind, id, version)
+  data = cache.get(key)
+  if data is None:
+    data = load()
+    if data is not None and _ttl(data) > 0:
+      cache.set(key, data, _ttl(data))
+  return data
+
+async def cached_data_async(kind, id, version, load):
+  # cached_data() for the async API: load is a coroutine function. Redis
+  # calls run in a thread so they do not block the event loop.
+  async def call(method, *args):
+    if isinstance(cache, RedisCache):
+      return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+  if version is None:
+    return await load()
+  key = detail_key(kind, id, version)
+  data = await call(cache.get, key)
+  if data is None:
+    data = await load()
+    if data is not None and _ttl(data) > 0:
+      await call(cache.set, key, data, _ttl(data))
+  return data
+
+def cached_page(kind, id, version, load, render):
+  # load() returns the format() dict (or None for a missing record) and
+  # render(data) the page. Pages with pending flash messages are rendered
+  # fresh and not stored, since the messages belong to one visitor.
+  key = None
+  if version is not None and '_flashes' not in session:
+    key = detail_key(kind, id, version) + ':html'
+    html = cache.get(key)
+    if html is not None:
+      return html
+
+  data = cached_data(kind, id, version, load)
+  if data is None:
+    return None
+
+  html = render(data)
+  ttl = _ttl(data)
+  if key is not None and ttl > 0:
+    cache.set(key, html, ttl)
+  return html
+
+def stats():
+  return cache.stats.as_dict()
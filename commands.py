@@ -0,0 +1,120 @@
+import json
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from assets import build_assets
+import exporter
+import importer
+from extensions import db
+from models import VenueArea, reconcile_show_counts, rollover_shows
+from query_plans import check_query_plans
+from search import create_fts_tables
+
+#----------------------------------------------------------------------------#
+# Flask CLI commands, registered by create_app().
+#----------------------------------------------------------------------------#
+
+@click.command('search-index')
+@with_appcontext
+def search_index_command():
+  # (Re)builds the SQLite FTS5 search tables; Postgres uses the trigram
+  # indexes created by the migrations instead.
+  dialect = db.engine.dialect.name
+  if dialect != 'sqlite':
+    print('Search indexes are managed by migrations on ' + dialect)
+    return
+  create_fts_tables(db.session)
+  db.session.commit()
+  print('SQLite FTS5 search tables rebuilt.')
+
+@click.command('import')
+@with_appcontext
+@click.argument('kind', type=click.Choice(sorted(importer.IMPORTERS)))
+@click.argument('file', type=click.File('rb'))
+@click.option('--format', type=click.Choice(importer.FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, help='Rows per INSERT batch.')
+@click.option('--max-errors', default=50, show_default=True, help='Row errors to print.')
+def import_command(kind, file, format, batch_size, max_errors):
+  # flask import venues venues.csv
+  format = format or importer.format_for(file.name)
+  report = importer.import_rows(
+    kind, file, format, batch_size or current_app.config['IMPORT_BATCH_SIZE']
+  )
+  for error in report.errors[:max_errors]:
+    print(f"row {error['row']}: {json.dumps(error['errors'])}")
+  if len(report.errors) > max_errors:
+    print(f'... and {len(report.errors) - max_errors} more row errors')
+  print(
+    f'{report.kind}: read {report.read}, inserted {report.inserted}, '
+    f'failed {len(report.errors)} in {report.elapsed:.2f}s '
+    f'({report.rows_per_second:.0f} rows/s)'
+  )
+  if report.error:
+    print(report.error)
+    raise SystemExit(1)
+
+@click.command('export')
+@with_appcontext
+@click.argument('kind', type=click.Choice(sorted(exporter.QUERIES)))
+@click.option('--format', type=click.Choice(exporter.FORMATS), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='Defaults to stdout.')
+def export_command(kind, format, output):
+  # flask export shows --format ndjson.gz -o shows.ndjson.gz
+  for chunk in exporter.stream_export(kind, format):
+    output.write(chunk)
+
+@click.command('venue-areas')
+@with_appcontext
+def venue_areas_command():
+  # Recomputes the VenueAreas summary, e.g. after rows were bulk loaded.
+  VenueArea.rebuild()
+  db.session.commit()
+  print('Venue area summary rebuilt.')
+
+@click.command('rollover-shows')
+@with_appcontext
+def rollover_shows_command():
+  # Run every minute or so (cron, a systemd timer): the stored upcoming
+  # counts lag real time by at most the interval.
+  moved = rollover_shows(db.session.connection())
+  db.session.commit()
+  print(f'{moved} shows rolled over to past.')
+
+@click.command('reconcile-show-counts')
+@with_appcontext
+def reconcile_show_counts_command():
+  # Recounts the stored show counters from Shows, repairing any drift.
+  repaired = reconcile_show_counts(db.session.connection())
+  db.session.commit()
+  print(f'{repaired} venues and artists had drifted show counts.')
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+  # EXPLAINs the hot queries and exits non-zero if any scans a whole table.
+  failures = check_query_plans()
+  for name, scans in failures.items():
+    print(f'{name}: ' + '; '.join(scans))
+  if failures:
+    raise SystemExit(1)
+  print('All checked queries use indexes.')
+
+@click.command('build-assets')
+def build_assets_command():
+  # Run on deploy, before the workers start: bundles, minifies, hashes and
+  # precompresses the static assets listed in assets.BUNDLES.
+  for name, (filename, sizes) in build_assets().items():
+    sizes = ', '.join(f'{suffix or "raw"} {size / 1024:.1f} KiB' for suffix, size in sizes.items())
+    print(f'{name} -> static/dist/{filename} ({sizes})')
+
+def register_commands(app):
+  app.cli.add_command(search_index_command)
+  app.cli.add_command(import_command)
+  app.cli.add_command(export_command)
+  app.cli.add_command(venue_areas_command)
+  app.cli.add_command(rollover_shows_command)
+  app.cli.add_command(reconcile_show_counts_command)
+  app.cli.add_command(check_query_plans_command)
+  app.cli.add_command(build_assets_command)
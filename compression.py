@@ -0,0 +1,127 @@
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+#----------------------------------------------------------------------------#
+# Response compression (COMPRESS_RESPONSES).
+#
+# WSGI middleware that gzips text responses, or brotli-compresses them when
+# the brotli package is installed and the client prefers it. Streamed bodies
+# (no Content-Length) are flushed after every chunk, so a streamed page
+# reaches the browser as it renders instead of at the end. Responses that
+# are already encoded (the static/dist bundles, .gz exports), partial
+# content, HEAD requests and bodies under COMPRESS_MIN_SIZE go out as they
+# are.
+#----------------------------------------------------------------------------#
+
+COMPRESSIBLE = (
+  'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+  'application/javascript', 'application/json', 'application/x-ndjson',
+)
+
+class _Gzip:
+  encoding = 'gzip'
+
+  def __init__(self, level):
+    # wbits 31: a gzip header and trailer around the deflate stream.
+    self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+  def compress(self, data, flush):
+    out = self._compressor.compress(data)
+    return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+  def finish(self):
+    return self._compressor.flush()
+
+class _Brotli:
+  encoding = 'br'
+
+  def __init__(self, quality):
+    self._compressor = brotli.Compressor(quality=quality)
+
+  def compress(self, data, flush):
+    out = self._compressor.process(data)
+    return out + self._compressor.flush() if flush else out
+
+  def finish(self):
+    return self._compressor.finish()
+
+def choose_compressor(accept_encoding, level=6, brotli_quality=4):
+  # A compressor for the best encoding the Accept-Encoding header allows,
+  # or None.
+  accepted = parse_accept_header(accept_encoding)
+  if brotli is not None and accepted['br'] and accepted['br'] >= accepted['gzip']:
+    return _Brotli(brotli_quality)
+  if accepted['gzip']:
+    return _Gzip(level)
+  return None
+
+class CompressionMiddleware:
+  def __init__(self, wsgi_app, level=6, brotli_quality=4, min_size=500):
+    self.wsgi_app = wsgi_app
+    self.level = level
+    self.brotli_quality = brotli_quality
+    self.min_size = min_size
+
+  def _compressor(self, environ):
+    if environ['REQUEST_METHOD'] == 'HEAD':
+      return None
+    return choose_compressor(environ.get('HTTP_ACCEPT_ENCODING'), self.level, self.brotli_quality)
+
+  def _compressible(self, status, headers):
+    if not status.startswith('200'):
+      return False
+    if 'Content-Encoding' in headers:
+      return False
+    if headers.get('Content-Type', '').split(';')[0].strip() not in COMPRESSIBLE:
+      return False
+    length = headers.get('Content-Length')
+    return length is None or int(length) >= self.min_size
+
+  def __call__(self, environ, start_response):
+    compressor = self._compressor(environ)
+    state = {}
+
+    def compressing_start_response(status, headers, exc_info=None):
+      headers = Headers(headers)
+      if self._compressible(status, headers):
+        # Caches must key the response on Accept-Encoding whether or not
+        # this client got it compressed.
+        vary = headers.get('Vary')
+        headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+        if compressor is not None:
+          # Streamed bodies are flushed chunk by chunk; a known-length body
+          # is compressed in one go.
+          state['flush'] = 'Content-Length' not in headers
+          headers.remove('Content-Length')
+          headers['Content-Encoding'] = compressor.encoding
+          # The encoded body is a different representation of the resource.
+          etag = headers.get('ETag')
+          if etag and not etag.startswith('W/'):
+            headers['ETag'] = 'W/' + etag
+      return start_response(status, headers.to_wsgi_list(), exc_info)
+
+    app_iter = self.wsgi_app(environ, compressing_start_response)
+    if 'flush' not in state:
+      return app_iter
+    return self._compress(app_iter, compressor, state['flush'])
+
+  def _compress(self, app_iter, compressor, flush):
+    try:
+      for chunk in app_iter:
+        if chunk:
+          out = compressor.compress(chunk, flush)
+          if out:
+            yield out
+      yield compressor.finish()
+    finally:
+      # Ends a streamed response's request context (stream_with_context).
+      close = getattr(app_iter, 'close', None)
+      if close is not None:
+        close()
@@ -0,0 +1,74 @@
+import hashlib
+from collections import namedtuple
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+
+from models import listing_version
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#
+# A view decorated with @conditional(version) first runs version(**view_args),
+# one small aggregate query over updated_at columns, and derives a weak ETag
+# from it. A request whose If-None-Match already holds that ETag gets a 304
+# before the view's own queries and template render run. ETAG_SALT is mixed
+# in so a deploy that changes the page markup can retire old ETags. The
+# version is kept for the view (current_version()), which caches its body
+# under it.
+#----------------------------------------------------------------------------#
+
+Version = namedtuple('Version', 'last_modified key')
+
+def _latest(*times):
+  times = [time for time in times if time is not None]
+  return max(times) if times else None
+
+def version_of(row):
+  # The Version of a model.version_statement() row, None for no row.
+  if row is None:
+    return None
+  return Version(_latest(row.updated_at, row.related_updated_at), tuple(row))
+
+def detail_version(model, id):
+  return version_of(model.version(id))
+
+def listings_version(*models):
+  row = listing_version(*models)
+  return Version(_latest(*row[::2]), tuple(row))
+
+def current_version():
+  # The Version @conditional computed for this request, or None.
+  return g.get('version')
+
+def make_etag(salt, endpoint, version):
+  key = repr((salt, endpoint, version.key))
+  return hashlib.sha1(key.encode()).hexdigest()
+
+def etag_for(version):
+  return make_etag(current_app.config.get('ETAG_SALT', ''), request.endpoint, version)
+
+def conditional(version):
+  def decorator(view):
+    @wraps(view)
+    def wrapper(**kwargs):
+      # Pending flash messages belong in the response body, so those
+      # requests are always rendered.
+      current = version(**kwargs) if request.method in ('GET', 'HEAD') else None
+      g.version = current
+      if current is None or '_flashes' in session:
+        return view(**kwargs)
+
+      etag = etag_for(current)
+      if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+      else:
+        response = make_response(view(**kwargs))
+        if response.status_code != 200:
+          return response
+      response.set_etag(etag, weak=True)
+      response.last_modified = current.last_modified
+      response.cache_control.no_cache = True
+      return response
+    return wrapper
+  return decorator
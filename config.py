@@ -1,14 +1,172 @@
 import os
-SECRET_KEY = os.urandom(32)
+
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+def _env_int(name, default):
+  return int(os.environ.get(name, default))
+
+def _database_url(url):
+  # Heroku-style URLs; SQLAlchemy only accepts the postgresql scheme.
+  if url and url.startswith('postgres://'):
+    return 'postgresql://' + url[len('postgres://'):]
+  return url
+
+def _env_bool(name, default):
+  value = os.environ.get(name)
+  if value is None:
+    return default
+  return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+# Profile: 'dev' (the default), 'test' or 'prod', from FYYUR_ENV. Every
+# setting below can be overridden from the environment; prod refuses to
+# start without DATABASE_URL and FYYUR_SECRET_KEY.
+ENV = os.environ.get('FYYUR_ENV', 'dev')
+if ENV not in ('dev', 'test', 'prod'):
+  raise RuntimeError(f'FYYUR_ENV must be dev, test or prod, not {ENV!r}')
+
+# Enable debug mode (never on in prod).
+DEBUG = ENV != 'prod' and _env_bool('FYYUR_DEBUG', ENV == 'dev')
+TESTING = ENV == 'test'
+
+# Shared by every worker so sessions and flash messages survive a request
+# landing on another process. Unset in dev and test, each process makes up
+# its own, so sessions do not outlive a restart.
+SECRET_KEY = os.environ.get('FYYUR_SECRET_KEY')
+if not SECRET_KEY:
+  if ENV == 'prod':
+    raise RuntimeError('FYYUR_SECRET_KEY must be set in prod')
+  SECRET_KEY = os.urandom(32)
 
 # Connect to the database
+DEFAULT_DATABASE_URLS = {
+  'dev': 'postgresql://localhost:5432/fyyur',
+  'test': 'postgresql://localhost:5432/fyyur_test',
+}
+SQLALCHEMY_DATABASE_URI = _database_url(
+  os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URLS.get(ENV)
+)
+if not SQLALCHEMY_DATABASE_URI:
+  raise RuntimeError('DATABASE_URL must be set in prod')
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Read replicas: the comma-separated DATABASE_REPLICA_URLS become the
+# replica_1..n binds that GET requests read from (see routing.py). A visitor
+# reads from the primary for REPLICA_STICKY_SECONDS after each write.
+SQLALCHEMY_BINDS = {
+  f'replica_{number}': _database_url(url.strip())
+  for number, url in enumerate(os.environ.get('DATABASE_REPLICA_URLS', '').split(','), start=1)
+  if url.strip()
+}
+REPLICA_STICKY_SECONDS = _env_int('REPLICA_STICKY_SECONDS', 10)
+
+# Connection pool per worker process. Size it so that
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) fits the PgBouncer / Postgres
+# connection limit.
+DB_POOL_SIZE = _env_int('DB_POOL_SIZE', 5)
+DB_MAX_OVERFLOW = _env_int('DB_MAX_OVERFLOW', 5 if ENV == 'prod' else 10)
+DB_POOL_TIMEOUT = _env_int('DB_POOL_TIMEOUT', 10 if ENV == 'prod' else 30)
+DB_POOL_RECYCLE = _env_int('DB_POOL_RECYCLE', 1800)
+DB_POOL_PRE_PING = _env_bool('DB_POOL_PRE_PING', ENV == 'prod')
+# Postgres statement_timeout in milliseconds, 0 for none. It is sent as a
+# startup option, so behind PgBouncer add "options" to
+# ignore_startup_parameters or set the timeout on the database role instead.
+DB_STATEMENT_TIMEOUT_MS = _env_int('DB_STATEMENT_TIMEOUT_MS', 5000 if ENV == 'prod' else 0)
+
+def engine_options(settings):
+  # SQLALCHEMY_ENGINE_OPTIONS for the configured database. SQLite's default
+  # pools take no sizing arguments.
+  url = settings['SQLALCHEMY_DATABASE_URI']
+  if url.startswith('sqlite'):
+    return {}
+  options = {
+    'pool_size': settings['DB_POOL_SIZE'],
+    'max_overflow': settings['DB_MAX_OVERFLOW'],
+    'pool_timeout': settings['DB_POOL_TIMEOUT'],
+    'pool_recycle': settings['DB_POOL_RECYCLE'],
+    'pool_pre_ping': settings['DB_POOL_PRE_PING'],
+  }
+  if url.startswith('postgresql') and settings['DB_STATEMENT_TIMEOUT_MS']:
+    options['connect_args'] = {
+      'options': f"-c statement_timeout={settings['DB_STATEMENT_TIMEOUT_MS']}"
+    }
+  return options
+
+# Number of ranked results per search page
+SEARCH_PAGE_SIZE = 20
+
+# Rows per page on the /venues, /artists and /shows listings
+PAGE_SIZE = 50
+
+# Detail page cache: 'memory' (per-process LRU), 'redis' or 'none'
+CACHE_BACKEND = os.environ.get('FYYUR_CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+CACHE_DEFAULT_TTL = 300
+CACHE_MAX_ENTRIES = 2048
+
+# /venues index: areas per page and venues listed under each area. With
+# VENUE_AREA_SUMMARY the areas come from the precomputed VenueAreas table.
+VENUE_AREA_SUMMARY = True
+VENUE_AREAS_PER_PAGE = 20
+VENUES_PER_AREA = 10
+
+# Bulk import: rows per INSERT batch, and the bearer token that enables the
+# POST /import/<kind> upload endpoint (disabled while unset)
+IMPORT_BATCH_SIZE = 1000
+IMPORT_TOKEN = os.environ.get('FYYUR_IMPORT_TOKEN')
+
+# Bearer token that enables the GET /export/<kind> download endpoint
+# (disabled while unset)
+EXPORT_TOKEN = os.environ.get('FYYUR_EXPORT_TOKEN')
+
+# Mixed into the conditional-GET ETags; change it on deploys that alter the
+# page markup so clients do not keep revalidating stale copies
+ETAG_SALT = ''
+
+# Minimum time between the start times of two shows by the same artist
+SHOW_BOOKING_GAP_MINUTES = 180
+
+# Most shows accepted in one POST /api/v1/shows
+SHOW_BATCH_LIMIT = 200
+
+# 'server' formats show times with Babel; 'client' leaves ISO timestamps in
+# <time> tags for moment.js to format in the browser
+DATETIME_RENDERING = os.environ.get('FYYUR_DATETIME_RENDERING', 'server')
+
+# Link the hashed, precompressed bundles built by `flask build-assets`
+# instead of the individual static files (see assets.py)
+ASSET_BUNDLES = _env_bool('FYYUR_ASSET_BUNDLES', not DEBUG)
+
+# Stream the /venues, /artists and /shows pages as they render instead of
+# building the whole HTML first, in chunks of about STREAM_CHUNK_SIZE
+# characters (see streaming.py)
+STREAM_TEMPLATES = _env_bool('FYYUR_STREAM_TEMPLATES', True)
+STREAM_CHUNK_SIZE = 8192
+
+# Compress text responses for clients that accept it: gzip at
+# COMPRESS_LEVEL, or brotli at COMPRESS_BROTLI_QUALITY when the brotli
+# package is installed. Bodies under COMPRESS_MIN_SIZE bytes go out as is.
+# Turn it off when a proxy in front already compresses.
+COMPRESS_RESPONSES = _env_bool('FYYUR_COMPRESS_RESPONSES', True)
+COMPRESS_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 4
+COMPRESS_MIN_SIZE = 500
+
+# Async mode (asgi.py): the detail and search API endpoints on SQLAlchemy's
+# asyncio engine. ASYNC_DATABASE_URL defaults to the database above through
+# its asyncio driver (asyncpg, aiosqlite). The async pool is shared by every
+# request in flight in a process, so it is sized separately.
+ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+ASYNC_DB_POOL_SIZE = _env_int('ASYNC_DB_POOL_SIZE', 20)
+ASYNC_DB_MAX_OVERFLOW = _env_int('ASYNC_DB_MAX_OVERFLOW', 10)
 
+# Request profiling: query count, DB and render time per request in a
+# Server-Timing header; requests slower than SLOW_REQUEST_MS are logged with
+# their statements
+PROFILE_REQUESTS = os.environ.get('FYYUR_PROFILE', '') == '1'
+SLOW_REQUEST_MS = 500
+PROFILE_MAX_STATEMENTS = 100
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql://gregorywinkler@localhost:5432/fyyur'
-SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+# Serve /metrics (Prometheus text format): route latency and status counts,
+# DB pool, template render and cache statistics
+METRICS_ENABLED = True
@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from extensions import db
+from models import Venue, Artist, Show, Genre, venue_genres, artist_genres
+
+#----------------------------------------------------------------------------#
+# Streaming export of venues, artists and shows.
+#
+# Rows are read from a server-side cursor in batches of YIELD_PER and encoded
+# into chunks of roughly CHUNK_SIZE bytes as they arrive, so memory use does
+# not grow with the table. Genres and the artist / venue names of a show are
+# joined in SQL; nothing is loaded per row.
+#----------------------------------------------------------------------------#
+
+FORMATS = ('csv', 'ndjson', 'csv.gz', 'ndjson.gz')
+
+MIMETYPES = {
+  'csv': 'text/csv',
+  'ndjson': 'application/x-ndjson',
+  'csv.gz': 'application/gzip',
+  'ndjson.gz': 'application/gzip'
+}
+
+YIELD_PER = 1000
+CHUNK_SIZE = 64 * 1024
+
+def _genre_names(model, link, owner_column):
+  # Comma-joined genre names of the outer row, as a correlated subquery.
+  if db.engine.dialect.name == 'postgresql':
+    names = db.func.string_agg(Genre.name, db.literal(', '))
+  else:
+    names = db.func.group_concat(Genre.name, ', ')
+  return db.select([names]) \
+    .where(link.c.genre_id == Genre.id) \
+    .where(owner_column == model.id) \
+    .scalar_subquery() \
+    .label('genres')
+
+def _venues_query():
+  return db.session.query(
+    Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone,
+    _genre_names(Venue, venue_genres, venue_genres.c.venue_id),
+    Venue.image_link, Venue.facebook_link, Venue.website_link,
+    Venue.seeking_talent, Venue.seeking_description
+  ).order_by(Venue.id)
+
+def _artists_query():
+  return db.session.query(
+    Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+    _genre_names(Artist, artist_genres, artist_genres.c.artist_id),
+    Artist.image_link, Artist.facebook_link, Artist.website_link,
+    Artist.seeking_venue, Artist.seeking_description
+  ).order_by(Artist.id)
+
+def _shows_query():
+  return db.session.query(
+    Show.id, Show.start_time,
+    Show.venue_id, Venue.name.label('venue_name'),
+    Show.artist_id, Artist.name.label('artist_name')
+  ) \
+    .join(Venue, Venue.id == Show.venue_id) \
+    .join(Artist, Artist.id == Show.artist_id) \
+    .order_by(Show.id)
+
+QUERIES = {
+  'venues': _venues_query,
+  'artists': _artists_query,
+  'shows': _shows_query
+}
+
+def export_query(kind):
+  return QUERIES[kind]()
+
+def columns_for(query):
+  return [column['name'] for column in query.column_descriptions]
+
+#  ----------------------------------------------------------------
+#  Encoders
+#  ----------------------------------------------------------------
+
+def _value(value):
+  return value.isoformat() if isinstance(value, datetime) else value
+
+def _csv_chunks(rows, columns):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow(columns)
+  for row in rows:
+    writer.writerow([_value(value) for value in row])
+    if buffer.tell() >= CHUNK_SIZE:
+      yield buffer.getvalue().encode()
+      buffer.seek(0)
+      buffer.truncate()
+  yield buffer.getvalue().encode()
+
+def _ndjson_chunks(rows, columns):
+  lines, size = [], 0
+  for row in rows:
+    line = json.dumps(dict(zip(columns, map(_value, row))))
+    lines.append(line)
+    size += len(line) + 1
+    if size >= CHUNK_SIZE:
+      yield ('\n'.join(lines) + '\n').encode()
+      lines, size = [], 0
+  if lines:
+    yield ('\n'.join(lines) + '\n').encode()
+
+def gzip_chunks(chunks):
+  # wbits=31 writes a gzip header and trailer around the deflate stream.
+  compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+  for chunk in chunks:
+    compressed = compressor.compress(chunk)
+    if compressed:
+      yield compressed
+  yield compressor.flush()
+
+def stream_export(kind, format='csv'):
+  # Generator of encoded byte chunks for one export.
+  if format not in FORMATS:
+    raise ValueError(f'Unsupported export format {format!r}')
+  query = export_query(kind)
+  columns = columns_for(query)
+  rows = query.yield_per(YIELD_PER)
+
+  base = format.split('.')[0]
+  chunks = _csv_chunks(rows, columns) if base == 'csv' else _ndjson_chunks(rows, columns)
+  if format.endswith('.gz'):
+    chunks = gzip_chunks(chunks)
+  return chunks
+
+def filename_for(kind, format):
+  return f'fyyur-{kind}-{datetime.now():%Y%m%d}.{format}'
@@ -0,0 +1,22 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from routing import RoutingSQLAlchemy
+
+#----------------------------------------------------------------------------#
+# Extensions, bound to an application by create_app().
+#
+# Flask-Migrate is not created here: it imports Alembic, which only the
+# `flask db` commands need (see create_app's migrate argument).
+#----------------------------------------------------------------------------#
+
+db = RoutingSQLAlchemy()
+
+@event.listens_for(Engine, 'connect')
+def _enforce_sqlite_foreign_keys(dbapi_connection, connection_record):
+  # SQLite ignores foreign keys unless every connection asks for them; show
+  # booking relies on them as Postgres does.
+  if isinstance(dbapi_connection, sqlite3.Connection):
+    dbapi_connection.execute('PRAGMA foreign_keys=ON')
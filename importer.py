@@ -0,0 +1,341 @@
+import codecs
+import csv
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+from flask import current_app
+
+from extensions import db
+from booking import BookingError, insert_show_batch
+from forms import VenueForm, ArtistForm, ShowForm
+from models import Venue, Artist, Genre, VenueArea, touch_parents
+
+#----------------------------------------------------------------------------#
+# Bulk import of venues, artists and shows.
+#
+# Rows are parsed as the file is read (CSV, NDJSON or a JSON array), checked
+# with the same WTForms rules as the create pages, and written in batches,
+# one transaction per batch. Show foreign keys are checked against id sets
+# loaded once up front rather than queried per row, and shows are booked a
+# batch at a time through booking.py, so an import cannot double-book an
+# artist either; the shows the booking check leaves out are reported and
+# the rest of the batch is kept. A batch the database rejects is retried
+# row by row so the failure is reported against the row that caused it.
+#----------------------------------------------------------------------------#
+
+FORMS = {
+  'venues': VenueForm,
+  'artists': ArtistForm,
+  'shows': ShowForm
+}
+
+FORMATS = ('csv', 'ndjson', 'json')
+
+BOOLEAN_FIELDS = ('seeking_talent', 'seeking_venue')
+
+class ImportReport:
+  def __init__(self, kind):
+    self.kind = kind
+    self.read = 0
+    self.inserted = 0
+    self.errors = []
+    # Set when the file itself could not be read to the end.
+    self.error = None
+    self.started = time.perf_counter()
+    self.elapsed = 0.0
+
+  def fail(self, line, errors):
+    self.errors.append({'row': line, 'errors': errors})
+
+  def finish(self):
+    self.elapsed = time.perf_counter() - self.started
+    return self
+
+  @property
+  def rows_per_second(self):
+    return self.read / self.elapsed if self.elapsed else 0.0
+
+  def as_dict(self):
+    return {
+      'kind': self.kind,
+      'read': self.read,
+      'inserted': self.inserted,
+      'failed': len(self.errors),
+      'errors': self.errors,
+      'error': self.error,
+      'seconds': round(self.elapsed, 3),
+      'rows_per_second': round(self.rows_per_second, 1)
+    }
+
+#  ----------------------------------------------------------------
+#  Parsing
+#  ----------------------------------------------------------------
+
+def _iter_json_array(text, chunk_size=65536):
+  # Yields the objects of a top-level JSON array without loading the file.
+  decoder = json.JSONDecoder()
+  buffer, position, started = '', 0, False
+  while True:
+    chunk = text.read(chunk_size)
+    buffer = buffer[position:] + (chunk or '')
+    position = 0
+    while True:
+      while position < len(buffer) and buffer[position] in ' \t\r\n,':
+        position += 1
+      if not started and position < len(buffer):
+        if buffer[position] != '[':
+          raise ValueError('Expected a JSON array of objects')
+        started = True
+        position += 1
+        continue
+      if position < len(buffer) and buffer[position] == ']':
+        return
+      try:
+        value, end = decoder.raw_decode(buffer, position)
+      except ValueError:
+        if not chunk:
+          raise
+        break
+      yield value
+      position = end
+    if not chunk:
+      return
+
+def read_rows(stream, format):
+  # (line, row dict) pairs from a binary stream; row is None for a line
+  # that is not valid JSON.
+  text = codecs.getreader('utf-8-sig')(stream)
+  if format == 'csv':
+    reader = csv.DictReader(text)
+    for row in reader:
+      yield reader.line_num, row
+  elif format == 'ndjson':
+    for line, raw in enumerate(text, start=1):
+      if raw.strip():
+        try:
+          yield line, json.loads(raw)
+        except ValueError:
+          yield line, None
+  elif format == 'json':
+    for line, row in enumerate(_iter_json_array(text), start=1):
+      yield line, row
+  else:
+    raise ValueError(f'Unsupported import format {format!r}')
+
+class _Unreadable(Exception):
+  pass
+
+def _read(stream, format):
+  # read_rows(), with a malformed file (not UTF-8, broken CSV quoting, a
+  # JSON body that is not an array) raised as _Unreadable.
+  rows = read_rows(stream, format)
+  while True:
+    try:
+      yield next(rows)
+    except StopIteration:
+      return
+    except (ValueError, csv.Error) as e:
+      raise _Unreadable(f'Could not read the {format} file: {e}')
+
+def _formdata(row):
+  # Maps a parsed row onto the form field encoding WTForms expects.
+  data = MultiDict()
+  for key, value in row.items():
+    if value is None:
+      continue
+    if key == 'genres':
+      names = value if isinstance(value, list) else str(value).split(',')
+      for name in names:
+        if name.strip():
+          data.add('genres', name.strip())
+    elif key in BOOLEAN_FIELDS:
+      if str(value).strip().lower() in ('1', 'true', 'y', 'yes', 'on'):
+        data[key] = 'y'
+    elif key == 'start_time':
+      try:
+        data[key] = datetime.fromisoformat(str(value).strip()).strftime('%Y-%m-%d %H:%M:%S')
+      except ValueError:
+        data[key] = str(value)
+    else:
+      data[key] = str(value)
+  return data
+
+#  ----------------------------------------------------------------
+#  Row builders
+#  ----------------------------------------------------------------
+
+class _Importer:
+  def __init__(self, kind):
+    self.kind = kind
+    self.form = FORMS[kind]
+
+  def validate(self, row):
+    form = self.form(formdata=_formdata(row), meta={'csrf': False})
+    if not form.validate():
+      return None, form.errors
+    return form.data, None
+
+  def write(self, rows):
+    # Adds rows to the session; -> {position: errors} for rows left out.
+    raise NotImplementedError
+
+  def finish(self):
+    pass
+
+class _ListingImporter(_Importer):
+  # Venues and artists go through the ORM so their genre associations are
+  # written with them; genres are resolved from one cached name map.
+  def __init__(self, kind):
+    super().__init__(kind)
+    self.model = Venue if kind == 'venues' else Artist
+    self.genres = {genre.name: genre for genre in Genre.query}
+    if self.model is Venue:
+      # Per-row area upkeep is replaced by one rebuild in finish(), for
+      # this import's session only.
+      db.session.info['venue_areas_sync'] = False
+
+  def _genres(self, names):
+    genres = []
+    for name in dict.fromkeys(names):
+      if name not in self.genres:
+        self.genres[name] = Genre(name=name)
+      genres.append(self.genres[name])
+    return genres
+
+  def build(self, data):
+    fields = {
+      column: data[column] for column in data
+      if column not in ('genres', 'csrf_token') and hasattr(self.model, column)
+    }
+    return self.model(genres=self._genres(data['genres']), **fields)
+
+  def write(self, rows):
+    db.session.add_all(self.build(data) for data in rows)
+    db.session.flush()
+    return {}
+
+  def finish(self):
+    if self.model is Venue:
+      db.session.info.pop('venue_areas_sync', None)
+      VenueArea.rebuild()
+
+class _ShowImporter(_Importer):
+  def __init__(self, kind):
+    super().__init__(kind)
+    self.artist_ids = {id for id, in db.session.query(Artist.id)}
+    self.venue_ids = {id for id, in db.session.query(Venue.id)}
+
+  def validate(self, row):
+    data, errors = super().validate(row)
+    if errors:
+      return None, errors
+    errors = {}
+    for key, known in (('artist_id', self.artist_ids), ('venue_id', self.venue_ids)):
+      try:
+        data[key] = int(data[key])
+      except (TypeError, ValueError):
+        errors[key] = ['Not a valid id.']
+        continue
+      if data[key] not in known:
+        errors[key] = [f'{key[:-3].title()} ID {data[key]} does not exist.']
+    return (None, errors) if errors else (data, None)
+
+  def write(self, rows):
+    rejected = insert_show_batch(rows, current_app.config['SHOW_BOOKING_GAP_MINUTES'])
+    rows = [data for position, data in enumerate(rows) if position not in rejected]
+    touch_parents(
+      db.session.connection(),
+      [data['venue_id'] for data in rows],
+      [data['artist_id'] for data in rows]
+    )
+    return {position: {'show': [str(error)]} for position, error in rejected.items()}
+
+IMPORTERS = {
+  'venues': _ListingImporter,
+  'artists': _ListingImporter,
+  'shows': _ShowImporter
+}
+
+#  ----------------------------------------------------------------
+#  Pipeline
+#  ----------------------------------------------------------------
+
+def _commit_batch(importer, batch, report):
+  try:
+    rejected = importer.write([data for _, data in batch])
+    db.session.commit()
+  except (SQLAlchemyError, BookingError):
+    db.session.rollback()
+  else:
+    for position, errors in sorted(rejected.items()):
+      report.fail(batch[position][0], errors)
+    report.inserted += len(batch) - len(rejected)
+    return
+
+  # Isolate the offending rows.
+  for line, data in batch:
+    try:
+      rejected = importer.write([data])
+      db.session.commit()
+    except SQLAlchemyError as e:
+      db.session.rollback()
+      report.fail(line, {'database': [str(getattr(e, 'orig', e))]})
+      continue
+    except BookingError as e:
+      db.session.rollback()
+      report.fail(line, {'show': [str(e)]})
+      continue
+    if rejected:
+      report.fail(line, rejected[0])
+    else:
+      report.inserted += 1
+
+def import_rows(kind, stream, format='csv', batch_size=1000):
+  importer = IMPORTERS[kind](kind)
+  report = ImportReport(kind)
+  batch = []
+  try:
+    try:
+      for line, row in _read(stream, format):
+        report.read += 1
+        if not isinstance(row, dict):
+          report.fail(line, {'row': ['Not a valid JSON object.']})
+          continue
+        data, errors = importer.validate(row)
+        if errors:
+          report.fail(line, errors)
+          continue
+        batch.append((line, data))
+        if len(batch) >= batch_size:
+          _commit_batch(importer, batch, report)
+          batch = []
+    except _Unreadable as e:
+      # The rows read before the error are still imported.
+      report.error = str(e)
+    if batch:
+      _commit_batch(importer, batch, report)
+  finally:
+    importer.finish()
+    db.session.commit()
+  return report.finish()
+
+def format_for(filename=None, mimetype=None):
+  # Guesses the import format from a file name or content type.
+  if filename:
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension in ('csv', 'ndjson', 'json'):
+      return extension
+    if extension == 'jsonl':
+      return 'ndjson'
+  if mimetype:
+    if 'csv' in mimetype:
+      return 'csv'
+    if 'ndjson' in mimetype or 'jsonl' in mimetype:
+      return 'ndjson'
+    if 'json' in mimetype:
+      return 'json'
+  return 'csv'
@@ -0,0 +1,218 @@
+import bisect
+import os
+import threading
+import time
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+import cache
+import profiling
+from extensions import db
+
+#----------------------------------------------------------------------------#
+# /metrics in the Prometheus text exposition format.
+#
+# Each app keeps its own Registry in app.extensions['metrics']. Counters
+# are kept in one plain dict per thread, so recording a request takes no
+# lock; a scrape sums the per-thread dicts, folding those of
+# finished threads into a retired total. Every worker process keeps its own
+# numbers and labels them with its pid, so under a multi-process server
+# aggregate with sum() over the pid label.
+#----------------------------------------------------------------------------#
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+  'fyyur_http_requests_total': ('counter', 'Requests by route, method and status.'),
+  'fyyur_http_request_duration_seconds': ('histogram', 'Time to response headers by route.'),
+  'fyyur_template_render_seconds': ('histogram', 'Template render time by template.'),
+  'fyyur_db_pool_checkouts_total': ('counter', 'Connections checked out of the pool.'),
+  'fyyur_db_pool_connects_total': ('counter', 'New DBAPI connections opened by the pool.'),
+  'fyyur_db_pool_wait_seconds': ('histogram', 'Time spent waiting for a pooled connection.'),
+  'fyyur_db_pool_size': ('gauge', 'Configured pool size.'),
+  'fyyur_db_pool_checked_out': ('gauge', 'Connections currently checked out.'),
+  'fyyur_db_pool_overflow': ('gauge', 'Connections currently open beyond the pool size.'),
+  'fyyur_cache_hits_total': ('counter', 'Detail cache hits.'),
+  'fyyur_cache_misses_total': ('counter', 'Detail cache misses.'),
+  'fyyur_cache_hit_ratio': ('gauge', 'Detail cache hits over lookups.'),
+}
+
+class Registry:
+  def __init__(self):
+    self._local = threading.local()
+    self._lock = threading.Lock()
+    self._shards = []
+    self._retired = {}
+
+  def _shard(self):
+    shard = getattr(self._local, 'shard', None)
+    if shard is None:
+      shard = self._local.shard = {}
+      with self._lock:
+        self._shards.append((threading.current_thread(), shard))
+    return shard
+
+  def inc(self, name, labels=(), amount=1):
+    shard = self._shard()
+    key = (name, labels)
+    shard[key] = shard.get(key, 0) + amount
+
+  def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+    # Non-cumulative bucket counts; exposition makes them cumulative.
+    shard = self._shard()
+    for key, amount in (
+      ((name, labels, bisect.bisect_left(buckets, value)), 1),
+      ((name + '_sum', labels), value),
+      ((name + '_count', labels), 1)
+    ):
+      shard[key] = shard.get(key, 0) + amount
+
+  def snapshot(self):
+    totals = {}
+    with self._lock:
+      live = []
+      for thread, shard in self._shards:
+        values = shard.copy()
+        if thread.is_alive():
+          live.append((thread, shard))
+          target = totals
+        else:
+          target = self._retired
+        for key, value in values.items():
+          target[key] = target.get(key, 0) + value
+      self._shards = live
+      for key, value in self._retired.items():
+        totals[key] = totals.get(key, 0) + value
+    return totals
+
+#  ----------------------------------------------------------------
+#  Exposition
+#  ----------------------------------------------------------------
+
+def _labels(labels):
+  if not labels:
+    return ''
+  pairs = ','.join(
+    '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+    for name, value in labels
+  )
+  return '{' + pairs + '}'
+
+def _histogram_lines(name, series, buckets=LATENCY_BUCKETS):
+  lines = []
+  for labels, (counts, total, count) in sorted(series.items()):
+    cumulative = 0
+    for index, bound in enumerate(buckets + (float('inf'),)):
+      cumulative += counts.get(index, 0)
+      le = '+Inf' if bound == float('inf') else repr(bound)
+      lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+    lines.append(f'{name}_sum{_labels(labels)} {total}')
+    lines.append(f'{name}_count{_labels(labels)} {count}')
+  return lines
+
+def _pool_gauges(engine):
+  pool = engine.pool
+  gauges = {}
+  for name, method in (
+    ('fyyur_db_pool_size', 'size'),
+    ('fyyur_db_pool_checked_out', 'checkedout'),
+    ('fyyur_db_pool_overflow', 'overflow')
+  ):
+    if hasattr(pool, method):
+      gauges[name] = getattr(pool, method)()
+  return gauges
+
+def exposition(registry, engine):
+  process = (('pid', os.getpid()),)
+  counters, histograms = {}, {}
+  for key, value in registry.snapshot().items():
+    name, labels = key[0], key[1]
+    if len(key) == 3:
+      histograms.setdefault(name, {}).setdefault(labels, [{}, 0, 0])[0][key[2]] = value
+    elif name.endswith('_sum') and name[:-4] in HELP:
+      histograms.setdefault(name[:-4], {}).setdefault(labels, [{}, 0, 0])[1] = value
+    elif name.endswith('_count') and name[:-6] in HELP:
+      histograms.setdefault(name[:-6], {}).setdefault(labels, [{}, 0, 0])[2] = value
+    else:
+      counters.setdefault(name, {})[labels] = value
+
+  stats = cache.stats()
+  counters['fyyur_cache_hits_total'] = {(): stats['hits']}
+  counters['fyyur_cache_misses_total'] = {(): stats['misses']}
+  gauges = {name: {(): value} for name, value in _pool_gauges(engine).items()}
+  gauges['fyyur_cache_hit_ratio'] = {(): stats['hit_rate']}
+
+  lines = []
+  for name, (kind, text) in HELP.items():
+    lines.append(f'# HELP {name} {text}')
+    lines.append(f'# TYPE {name} {kind}')
+    if kind == 'histogram':
+      series = {process + labels: values for labels, values in histograms.get(name, {}).items()}
+      lines.extend(_histogram_lines(name, series))
+    else:
+      series = (counters if kind == 'counter' else gauges).get(name, {})
+      for labels, value in sorted(series.items()):
+        lines.append(f'{name}{_labels(process + labels)} {value}')
+  return '\n'.join(lines) + '\n'
+
+#  ----------------------------------------------------------------
+#  Collection
+#  ----------------------------------------------------------------
+
+def _time_checkouts(registry, engine):
+  # The pool has no "checkout requested" event, so the wait is timed
+  # around pool.connect(); re-applied whenever the pool is recreated.
+  pool = engine.pool
+  connect = pool.connect
+
+  def timed_connect():
+    started = time.perf_counter()
+    try:
+      return connect()
+    finally:
+      registry.observe('fyyur_db_pool_wait_seconds', (), time.perf_counter() - started)
+
+  pool.connect = timed_connect
+
+def init_metrics(app):
+  if not app.config.get('METRICS_ENABLED'):
+    return
+
+  registry = app.extensions['metrics'] = Registry()
+  # Creating the engine does not connect.
+  engine = db.get_engine(app)
+
+  event.listen(engine, 'checkout',
+               lambda *args: registry.inc('fyyur_db_pool_checkouts_total'))
+  event.listen(engine, 'connect',
+               lambda *args: registry.inc('fyyur_db_pool_connects_total'))
+  event.listen(engine, 'engine_disposed', lambda engine: _time_checkouts(registry, engine))
+  _time_checkouts(registry, engine)
+
+  profiling.add_render_listener(app, lambda name, elapsed: registry.observe(
+    'fyyur_template_render_seconds', (('template', name),), elapsed
+  ))
+
+  @app.before_request
+  def start_timer():
+    g.metrics_started = time.perf_counter()
+
+  @app.after_request
+  def record_request(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+      return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    registry.inc('fyyur_http_requests_total', (
+      ('route', route), ('method', request.method), ('status', response.status_code)
+    ))
+    registry.observe(
+      'fyyur_http_request_duration_seconds', (('route', route),),
+      time.perf_counter() - started
+    )
+    return response
+
+  @app.route('/metrics')
+  def metrics():
+    return Response(exposition(registry, engine), mimetype='text/plain; version=0.0.4')
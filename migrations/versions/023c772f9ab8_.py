@@ -0,0 +1,76 @@
+"""search indexes for venues and artists
+
+Revision ID: 023c772f9ab8
+Revises: e5e1d70854f1
+Create Date: 2026-10-18 09:12:41.507318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '023c772f9ab8'
+down_revision = 'e5e1d70854f1'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+
+# Must match search.search_document() exactly for the planner to use it.
+SEARCH_DOCUMENT = " || ' ' || ".join(
+    "coalesce({}, '')".format(column) for column in SEARCH_COLUMNS
+)
+
+TABLES = {'Venues': 'venues', 'Artists': 'artists'}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table, prefix in TABLES.items():
+            op.execute(
+                'CREATE INDEX ix_{}_search_trgm ON "{}" '
+                'USING gin (({}) gin_trgm_ops)'.format(prefix, table, SEARCH_DOCUMENT)
+            )
+    elif dialect == 'sqlite':
+        columns = ', '.join(SEARCH_COLUMNS)
+        new_values = ', '.join('new.' + column for column in SEARCH_COLUMNS)
+        old_values = ', '.join('old.' + column for column in SEARCH_COLUMNS)
+        for source, prefix in TABLES.items():
+            table = prefix + '_fts'
+            op.execute(
+                "CREATE VIRTUAL TABLE {} USING fts5({}, content='{}', content_rowid='id')"
+                .format(table, columns, source)
+            )
+            op.execute(
+                'CREATE TRIGGER {t}_ai AFTER INSERT ON "{s}" BEGIN '
+                'INSERT INTO {t}(rowid, {c}) VALUES (new.id, {n}); END'
+                .format(t=table, s=source, c=columns, n=new_values)
+            )
+            op.execute(
+                'CREATE TRIGGER {t}_ad AFTER DELETE ON "{s}" BEGIN '
+                "INSERT INTO {t}({t}, rowid, {c}) VALUES ('delete', old.id, {o}); END"
+                .format(t=table, s=source, c=columns, o=old_values)
+            )
+            op.execute(
+                'CREATE TRIGGER {t}_au AFTER UPDATE ON "{s}" BEGIN '
+                "INSERT INTO {t}({t}, rowid, {c}) VALUES ('delete', old.id, {o}); "
+                'INSERT INTO {t}(rowid, {c}) VALUES (new.id, {n}); END'
+                .format(t=table, s=source, c=columns, n=new_values, o=old_values)
+            )
+            op.execute("INSERT INTO {t}({t}) VALUES ('rebuild')".format(t=table))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for prefix in TABLES.values():
+            op.execute('DROP INDEX IF EXISTS ix_{}_search_trgm'.format(prefix))
+    elif dialect == 'sqlite':
+        for prefix in TABLES.values():
+            table = prefix + '_fts'
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER IF EXISTS {}_{}'.format(table, suffix))
+            op.execute('DROP TABLE IF EXISTS {}'.format(table))
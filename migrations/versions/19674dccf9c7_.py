@@ -0,0 +1,30 @@
+"""unique shows per artist, venue and start time
+
+Revision ID: 19674dccf9c7
+Revises: b71e0c9d4a52
+Create Date: 2026-10-18 18:42:51.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '19674dccf9c7'
+down_revision = 'b71e0c9d4a52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the first listing of any show that was posted more than once.
+    op.execute(
+        'DELETE FROM "Shows" WHERE start_time IS NOT NULL AND id NOT IN ('
+        'SELECT min(id) FROM "Shows" GROUP BY artist_id, venue_id, start_time)'
+    )
+    op.create_index('uq_shows_artist_id_venue_id_start_time', 'Shows',
+                    ['artist_id', 'venue_id', 'start_time'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_shows_artist_id_venue_id_start_time', table_name='Shows')
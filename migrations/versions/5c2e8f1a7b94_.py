@@ -0,0 +1,28 @@
+"""deletion counters for the listing ETags
+
+Revision ID: 5c2e8f1a7b94
+Revises: e20896c1a0dd
+Create Date: 2026-10-18 21:12:04.531877
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e8f1a7b94'
+down_revision = 'e20896c1a0dd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('TableDeletions',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('deletions', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade():
+    op.drop_table('TableDeletions')
@@ -0,0 +1,152 @@
+"""normalized genre tables
+
+Revision ID: 8cc7316b8a96
+Revises: 023c772f9ab8
+Create Date: 2026-10-18 11:03:27.114962
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8cc7316b8a96'
+down_revision = '023c772f9ab8'
+branch_labels = None
+depends_on = None
+
+TABLES = {'Venues': 'venue', 'Artists': 'artist'}
+
+
+def search_document(columns):
+    return " || ' ' || ".join("coalesce({}, '')".format(column) for column in columns)
+
+
+def drop_search_indexes(dialect):
+    for prefix in TABLES.values():
+        if dialect == 'postgresql':
+            op.execute('DROP INDEX IF EXISTS ix_{}s_search_trgm'.format(prefix))
+        elif dialect == 'sqlite':
+            table = prefix + 's_fts'
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER IF EXISTS {}_{}'.format(table, suffix))
+            op.execute('DROP TABLE IF EXISTS {}'.format(table))
+
+
+def create_search_indexes(dialect, columns):
+    for source, prefix in TABLES.items():
+        if dialect == 'postgresql':
+            op.execute(
+                'CREATE INDEX ix_{}s_search_trgm ON "{}" '
+                'USING gin (({}) gin_trgm_ops)'.format(prefix, source, search_document(columns))
+            )
+        elif dialect == 'sqlite':
+            table = prefix + 's_fts'
+            names = ', '.join(columns)
+            new_values = ', '.join('new.' + column for column in columns)
+            old_values = ', '.join('old.' + column for column in columns)
+            op.execute(
+                "CREATE VIRTUAL TABLE {} USING fts5({}, content='{}', content_rowid='id')"
+                .format(table, names, source)
+            )
+            op.execute(
+                'CREATE TRIGGER {t}_ai AFTER INSERT ON "{s}" BEGIN '
+                'INSERT INTO {t}(rowid, {c}) VALUES (new.id, {n}); END'
+                .format(t=table, s=source, c=names, n=new_values)
+            )
+            op.execute(
+                'CREATE TRIGGER {t}_ad AFTER DELETE ON "{s}" BEGIN '
+                "INSERT INTO {t}({t}, rowid, {c}) VALUES ('delete', old.id, {o}); END"
+                .format(t=table, s=source, c=names, o=old_values)
+            )
+            op.execute(
+                'CREATE TRIGGER {t}_au AFTER UPDATE ON "{s}" BEGIN '
+                "INSERT INTO {t}({t}, rowid, {c}) VALUES ('delete', old.id, {o}); "
+                'INSERT INTO {t}(rowid, {c}) VALUES (new.id, {n}); END'
+                .format(t=table, s=source, c=names, n=new_values, o=old_values)
+            )
+            op.execute("INSERT INTO {t}({t}) VALUES ('rebuild')".format(t=table))
+
+
+def split_genres(value):
+    # Stored as ', '.join(names); tolerate Postgres array literals too.
+    value = (value or '').strip().strip('{}')
+    return [name.strip().strip('"') for name in value.split(',') if name.strip().strip('"')]
+
+
+def upgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+
+    genres = op.create_table('Genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    links = {}
+    for source, prefix in TABLES.items():
+        links[source] = op.create_table('{}_genres'.format(prefix),
+        sa.Column('{}_id'.format(prefix), sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['{}_id'.format(prefix)], ['{}.id'.format(source)], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genres.id'], ),
+        sa.PrimaryKeyConstraint('{}_id'.format(prefix), 'genre_id')
+        )
+        op.create_index('ix_{}_genres_genre_id'.format(prefix), '{}_genres'.format(prefix),
+                        ['genre_id', '{}_id'.format(prefix)], unique=False)
+
+    # Backfill the association tables from the comma-joined strings.
+    parsed = {}
+    for source in TABLES:
+        rows = bind.execute(sa.text('SELECT id, genres FROM "{}"'.format(source))).fetchall()
+        parsed[source] = [(row[0], split_genres(row[1])) for row in rows]
+
+    names = sorted({name for rows in parsed.values() for _, row_names in rows for name in row_names})
+    if names:
+        op.bulk_insert(genres, [{'name': name} for name in names])
+    genre_ids = dict(bind.execute(sa.text('SELECT name, id FROM "Genres"')).fetchall())
+
+    for source, prefix in TABLES.items():
+        link_rows = [
+            {'{}_id'.format(prefix): row_id, 'genre_id': genre_ids[name]}
+            for row_id, row_names in parsed[source]
+            for name in dict.fromkeys(row_names)
+        ]
+        if link_rows:
+            op.bulk_insert(links[source], link_rows)
+
+    drop_search_indexes(dialect)
+    for source in TABLES:
+        with op.batch_alter_table(source) as batch_op:
+            batch_op.drop_column('genres')
+    create_search_indexes(dialect, ('name', 'city', 'state'))
+
+
+def downgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+
+    drop_search_indexes(dialect)
+    op.add_column('Venues', sa.Column('genres', sa.String(), nullable=True))
+    op.add_column('Artists', sa.Column('genres', sa.String(length=120), nullable=True))
+
+    for source, prefix in TABLES.items():
+        rows = bind.execute(sa.text(
+            'SELECT l.{p}_id, g.name FROM {p}_genres l JOIN "Genres" g ON g.id = l.genre_id '
+            'ORDER BY l.{p}_id, g.name'.format(p=prefix)
+        )).fetchall()
+        joined = {}
+        for row_id, name in rows:
+            joined.setdefault(row_id, []).append(name)
+        for row_id, row_names in joined.items():
+            bind.execute(
+                sa.text('UPDATE "{}" SET genres = :genres WHERE id = :id'.format(source)),
+                {'genres': ', '.join(row_names), 'id': row_id}
+            )
+
+    create_search_indexes(dialect, ('name', 'city', 'state', 'genres'))
+    for prefix in TABLES.values():
+        op.drop_index('ix_{}_genres_genre_id'.format(prefix), table_name='{}_genres'.format(prefix))
+        op.drop_table('{}_genres'.format(prefix))
+    op.drop_table('Genres')
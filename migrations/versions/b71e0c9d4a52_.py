@@ -0,0 +1,40 @@
+"""updated_at versions for conditional GET
+
+Revision ID: b71e0c9d4a52
+Revises: 02ea2d4d77a9
+Create Date: 2026-10-18 15:12:08.530417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71e0c9d4a52'
+down_revision = '02ea2d4d77a9'
+branch_labels = None
+depends_on = None
+
+TABLES = {'Venues': 'venues', 'Artists': 'artists', 'Shows': 'shows'}
+
+
+def upgrade():
+    # Existing rows start at the migration time, in UTC like the app writes.
+    if op.get_bind().dialect.name == 'postgresql':
+        now = sa.text("timezone('utc', now())")
+    else:
+        now = sa.text('CURRENT_TIMESTAMP')
+    for table, prefix in TABLES.items():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                          server_default=now))
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', server_default=None)
+        op.create_index('ix_{}_updated_at'.format(prefix), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table, prefix in TABLES.items():
+        op.drop_index('ix_{}_updated_at'.format(prefix), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
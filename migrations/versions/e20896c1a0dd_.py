@@ -0,0 +1,61 @@
+"""stored upcoming / past show counters
+
+Revision ID: e20896c1a0dd
+Revises: 19674dccf9c7
+Create Date: 2026-10-18 19:05:37.918240
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e20896c1a0dd'
+down_revision = '19674dccf9c7'
+branch_labels = None
+depends_on = None
+
+COUNTED = {'Venues': 'venue_id', 'Artists': 'artist_id'}
+
+
+def upgrade():
+    op.create_table('ShowRollovers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    for table in COUNTED:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('upcoming_shows_count', sa.Integer(), nullable=False,
+                                          server_default='0'))
+            batch_op.add_column(sa.Column('past_shows_count', sa.Integer(), nullable=False,
+                                          server_default='0'))
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('upcoming_shows_count', server_default=None)
+            batch_op.alter_column('past_shows_count', server_default=None)
+
+    # Count every existing show either side of the first watermark; start
+    # times are local like datetime.now() in the app.
+    now = datetime.now()
+    op.get_bind().execute(
+        sa.text('INSERT INTO "ShowRollovers" (id, rolled_over_at) VALUES (1, :now)'), now=now
+    )
+    for table, key in COUNTED.items():
+        op.get_bind().execute(sa.text(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Shows" '
+            'WHERE "Shows".{key} = "{table}".id AND "Shows".start_time >= :now), '
+            'past_shows_count = (SELECT count(*) FROM "Shows" '
+            'WHERE "Shows".{key} = "{table}".id AND "Shows".start_time < :now)'
+            .format(table=table, key=key)
+        ), now=now)
+
+
+def downgrade():
+    for table in COUNTED:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
+    op.drop_table('ShowRollovers')
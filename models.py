@@ -1,64 +1,267 @@
-from app import db
+from extensions import db
 from datetime import datetime
+from flask import current_app, g, has_app_context
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def partition_shows(shows, now=None):
+  # Splits (start_time, show) pairs into past and upcoming lists around
+  # a single captured "now" so every row is judged against the same instant.
+  now = now or datetime.now()
+  past_shows, upcoming_shows = [], []
+  for start_time, show in shows:
+    if start_time < now:
+      past_shows.append(show)
+    else:
+      upcoming_shows.append(show)
+  return past_shows, upcoming_shows
+
+venue_genres = db.Table('venue_genres',
+  db.Column('venue_id', db.Integer, db.ForeignKey('Venues.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('Genres.id'), primary_key=True),
+  db.Index('ix_venue_genres_genre_id', 'genre_id', 'venue_id')
+)
+
+artist_genres = db.Table('artist_genres',
+  db.Column('artist_id', db.Integer, db.ForeignKey('Artists.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('Genres.id'), primary_key=True),
+  db.Index('ix_artist_genres_genre_id', 'genre_id', 'artist_id')
+)
+
+class Genre(db.Model):
+    __tablename__ = 'Genres'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @classmethod
+    def name_map(cls):
+      # {name: id} for every genre, loaded at most once per request.
+      if has_app_context() and 'genre_ids' in g:
+        return g.genre_ids
+      genre_ids = dict(db.session.query(cls.name, cls.id).all())
+      if has_app_context():
+        g.genre_ids = genre_ids
+      return genre_ids
+
+    @classmethod
+    def id_for(cls, name):
+      return cls.name_map().get(name)
+
+    @classmethod
+    def matching(cls, word, name_map=None):
+      # Ids of the genres whose name contains word, case-insensitively, in
+      # name_map or else the request's name_map().
+      word = word.lower()
+      name_map = cls.name_map() if name_map is None else name_map
+      return [
+        genre_id for name, genre_id in name_map.items()
+        if word in name.lower()
+      ]
+
+    @classmethod
+    def resolve(cls, names):
+      # Genre rows for the given names, creating any that do not exist yet.
+      names = list(dict.fromkeys(name.strip() for name in names or [] if name.strip()))
+      if not names:
+        return []
+      existing = {genre.name: genre for genre in cls.query.filter(cls.name.in_(names))}
+      if has_app_context():
+        g.pop('genre_ids', None)
+      return [existing.get(name) or cls(name=name) for name in names]
+
+    def __repr__(self):
+      return f"<Genre id={self.id}, name={self.name}"
 
 class Venue(db.Model):
     __tablename__ = 'Venues'
+    __table_args__ = (
+      db.Index('ix_venues_city_state_name_id', 'city', 'state', 'name', 'id'),
+      db.Index('ix_venues_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    # active_history: the VenueAreas events need the old area even when the
+    # attribute was expired before it was set.
+    city = db.column_property(db.Column(db.String(120)), active_history=True)
+    state = db.column_property(db.Column(db.String(120)), active_history=True)
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.String)
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name', lazy=True)
     website_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String)
+    # Kept by touch_parents() and rollover_shows(), relative to the
+    # ShowRollover watermark.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
-    @property
-    def past_shows(self):
-      past_shows = list(
-        filter(lambda s: s.start_time < datetime.now(), self.shows)
+    @classmethod
+    def listing_key(cls):
+      # Unique sort key of the listing, served by ix_venues_city_state_name_id.
+      return (cls.city, cls.state, cls.name, cls.id)
+
+    @classmethod
+    def areas_query(cls, genre_ids=None):
+      # (city, state, venue_count) per area, grouped in the database, and the
+      # area sort key. Reads the VenueAreas summary when it is enabled and no
+      # filter applies.
+      if genre_ids is None and current_app.config.get('VENUE_AREA_SUMMARY'):
+        query = db.session.query(VenueArea.city, VenueArea.state, VenueArea.venue_count)
+        return query, (VenueArea.city, VenueArea.state)
+
+      city, state = cls.area_columns()
+      query = db.session.query(city, state, db.func.count(cls.id).label('venue_count'))
+      if genre_ids is not None:
+        query = query.filter(cls.in_genres(genre_ids))
+      return query.group_by(city, state), (city, state)
+
+    @classmethod
+    def area_columns(cls):
+      # city and state as VenueAreas keys them, with NULL stored as ''. The
+      # '' is inlined so a GROUP BY repeating these matches the select list.
+      blank = db.literal_column("''")
+      return (
+        db.func.coalesce(cls.city, blank).label('city'),
+        db.func.coalesce(cls.state, blank).label('state')
       )
-      return [{
-        'artist_id': show.artist.id,
-        'artist_name': show.artist.name,
-        'artist_image_link': show.artist.image_link,
-        'start_time': show.start_time.isoformat()
-      } for show in past_shows]
 
-    @property
-    def upcoming_shows(self):
-      upcoming_shows = list(
-        filter(lambda s: s.start_time >= datetime.now(), self.shows)
+    @classmethod
+    def in_areas(cls, areas):
+      # Filter criterion for venues in any of the (city, state) areas. Named
+      # areas are matched on the raw columns so ix_venues_city_state_name_id
+      # serves them; an area with a blank part also takes its NULLs.
+      named = [(city, state) for city, state in areas if city and state]
+      criteria = [db.tuple_(cls.city, cls.state).in_(named)] if named else []
+      for city, state in areas:
+        if not (city and state):
+          criteria.append(db.and_(*(
+            column == value if value else db.func.coalesce(column, '') == ''
+            for column, value in ((cls.city, city), (cls.state, state))
+          )))
+      return db.or_(*criteria)
+
+    @classmethod
+    def area_venues_query(cls, areas, per_area, genre_ids=None):
+      # The first per_area venues of each of the given areas, in one query;
+      # rows have the columns of read_models.VenueItem.
+      city, state = cls.area_columns()
+      position = db.func.row_number().over(
+        partition_by=(city, state),
+        order_by=(cls.name, cls.id)
+      ).label('position')
+      ranked = db.session.query(cls.id, cls.name, city, state, position) \
+        .filter(cls.in_areas([(area.city, area.state) for area in areas]))
+      if genre_ids is not None:
+        ranked = ranked.filter(cls.in_genres(genre_ids))
+      ranked = ranked.subquery()
+
+      return db.session.query(ranked.c.id, ranked.c.name, ranked.c.city, ranked.c.state) \
+        .filter(ranked.c.position <= per_area) \
+        .order_by(ranked.c.city, ranked.c.state, ranked.c.name, ranked.c.id)
+
+    @classmethod
+    def listing_query(cls):
+      # The columns of read_models.VenueItem, in order.
+      return db.session.query(cls.id, cls.name, cls.city, cls.state)
+
+    @classmethod
+    def in_genres(cls, genre_ids):
+      # Filter criterion served by ix_venue_genres_genre_id.
+      return cls.id.in_(
+        db.select([venue_genres.c.venue_id]).where(venue_genres.c.genre_id.in_(genre_ids))
       )
-      return [{
-        'artist_id': show.artist.id,
-        'artist_name': show.artist.name,
-        'artist_image_link': show.artist.image_link,
-        'start_time': show.start_time.isoformat()
-      } for show in upcoming_shows]
+
+    @staticmethod
+    def _show_columns():
+      return (Show.start_time, Artist.id, Artist.name, Artist.image_link)
+
+    @staticmethod
+    def _show_rows(rows):
+      return [(start_time, {
+        'artist_id': artist_id,
+        'artist_name': artist_name,
+        'artist_image_link': artist_image_link,
+        'start_time': start_time
+      }) for start_time, artist_id, artist_name, artist_image_link in rows
+        if start_time is not None]
+
+    @classmethod
+    def detail_statement(cls, venue_id):
+      # One joined query for the venue and all of its shows. A plain
+      # statement, so async_api.py runs it on the asyncio engine too.
+      return db.select([cls, *cls._show_columns()]) \
+        .options(db.selectinload(cls.genres)) \
+        .outerjoin(Show, Show.venue_id == cls.id) \
+        .outerjoin(Artist, Artist.id == Show.artist_id) \
+        .where(cls.id == venue_id) \
+        .order_by(Show.start_time)
+
+    @classmethod
+    def detail_from_rows(cls, rows, now=None):
+      # The format() dict from the rows of detail_statement(), or None when
+      # the venue does not exist.
+      if not rows:
+        return None
+
+      shows = cls._show_rows(row[1:] for row in rows)
+      return rows[0][0].format(shows=shows, now=now)
+
+    @classmethod
+    def load_detail(cls, venue_id, now=None):
+      rows = db.session.execute(cls.detail_statement(venue_id)).all()
+      return cls.detail_from_rows(rows, now)
+
+    @classmethod
+    def version_statement(cls, venue_id, now=None):
+      # Everything the detail page depends on: the venue's own timestamp
+      # (bumped by its show writes too), its artists' timestamps, the show
+      # count and the next show to move from upcoming to past. No row when
+      # the venue does not exist.
+      now = now or datetime.now()
+      return db.select([
+          cls.updated_at,
+          db.func.max(Artist.updated_at).label('related_updated_at'),
+          db.func.count(Show.id).label('show_count'),
+          db.func.min(db.case((Show.start_time >= now, Show.start_time))).label('next_show')
+        ]) \
+        .outerjoin(Show, Show.venue_id == cls.id) \
+        .outerjoin(Artist, Artist.id == Show.artist_id) \
+        .where(cls.id == venue_id) \
+        .group_by(cls.id, cls.updated_at)
+
+    @classmethod
+    def version(cls, venue_id, now=None):
+      return db.session.execute(cls.version_statement(venue_id, now)).first()
+
+    def load_shows(self):
+      rows = db.session.query(*self._show_columns()) \
+        .join(Artist, Artist.id == Show.artist_id) \
+        .filter(Show.venue_id == self.id) \
+        .order_by(Show.start_time) \
+        .all()
+      return self._show_rows(rows)
 
     @property
-    def past_shows_count(self):
-      try:
-        return len(self.past_shows)
-      except:
-        return 0
+    def past_shows(self):
+      return partition_shows(self.load_shows())[0]
 
     @property
-    def upcoming_shows_count(self):
-      try:
-        return len(self.upcoming_shows)
-      except:
-        return 0
+    def upcoming_shows(self):
+      return partition_shows(self.load_shows())[1]
 
     def update_db(self):
       db.session.commit()
 
-    def format(self):
+    def format(self, shows=None, now=None):
+      if shows is None:
+        shows = self.load_shows()
+      past_shows, upcoming_shows = partition_shows(shows, now)
+
       return {
         'id': self.id,
         'name': self.name,
@@ -66,98 +269,242 @@ class Venue(db.Model):
         'city': self.city,
         'state': self.state,
         'phone': self.phone,
-        'genres': self.genres.split(', '),
+        'genres': [genre.name for genre in self.genres],
         'image_link': self.image_link,
         'facebook_link': self.facebook_link,
         'website': self.website_link,
         'seeking_talent': self.seeking_talent,
         'seeking_description': self.seeking_description,
-        'past_shows_count': self.past_shows_count,
-        'past_shows': self.past_shows,
-        'upcoming_shows_count': self.upcoming_shows_count,
-        'upcoming_shows': self.upcoming_shows
+        'past_shows_count': len(past_shows),
+        'past_shows': past_shows,
+        'upcoming_shows_count': len(upcoming_shows),
+        'upcoming_shows': upcoming_shows
       }
 
     def __repr__(self):
       return f"<Venue id={self.id}, name={self.name}"
 
-    def __getitem__(self, key):
-      return getattr(self, key)
+# Dialects with INSERT ... ON CONFLICT DO UPDATE.
+UPSERT_INSERTS = {
+  'postgresql': postgresql.insert,
+  'sqlite': sqlite.insert,
+}
+
+class VenueArea(db.Model):
+    # Venue counts per city/state, kept in step with Venues by the mapper
+    # events below so the /venues index never has to group the whole table.
+    __tablename__ = 'VenueAreas'
+
+    city = db.Column(db.String(120), primary_key=True)
+    state = db.Column(db.String(120), primary_key=True)
+    venue_count = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def syncing(venue):
+      # A bulk loader sets session.info['venue_areas_sync'] = False on its
+      # own session to skip the per-row events, and rebuild()s afterwards.
+      return db.inspect(venue).session.info.get('venue_areas_sync', True)
+
+    @classmethod
+    def adjust(cls, connection, city, state, delta):
+      areas = cls.__table__
+      city, state = city or '', state or ''
+      area = (areas.c.city == city) & (areas.c.state == state)
+      insert = UPSERT_INSERTS.get(connection.dialect.name)
+      if delta > 0 and insert is not None:
+        # One statement, so two first venues of a new area cannot both
+        # insert it.
+        connection.execute(insert(areas).values(city=city, state=state, venue_count=delta)
+          .on_conflict_do_update(
+            index_elements=[areas.c.city, areas.c.state],
+            set_={'venue_count': areas.c.venue_count + delta}
+          ))
+        return
+      updated = connection.execute(
+        areas.update().where(area).values(venue_count=areas.c.venue_count + delta)
+      ).rowcount
+      if not updated and delta > 0:
+        connection.execute(areas.insert().values(city=city, state=state, venue_count=delta))
+      elif delta < 0:
+        connection.execute(areas.delete().where(area & (areas.c.venue_count <= 0)))
+
+    @classmethod
+    def rebuild(cls):
+      # Recomputes the whole summary set-based, e.g. after a bulk import.
+      areas = cls.__table__
+      db.session.execute(areas.delete())
+      db.session.execute(areas.insert().from_select(
+        ['city', 'state', 'venue_count'],
+        db.select([*Venue.area_columns(), db.func.count(Venue.id)])
+          .group_by(*Venue.area_columns())
+      ))
+
+@db.event.listens_for(Venue, 'after_insert')
+def _venue_inserted(mapper, connection, venue):
+  if VenueArea.syncing(venue):
+    VenueArea.adjust(connection, venue.city, venue.state, 1)
+
+@db.event.listens_for(Venue, 'after_delete')
+def _venue_deleted(mapper, connection, venue):
+  if VenueArea.syncing(venue):
+    VenueArea.adjust(connection, venue.city, venue.state, -1)
+
+@db.event.listens_for(Venue, 'after_update')
+def _venue_updated(mapper, connection, venue):
+  attrs = db.inspect(venue).attrs
+  if not VenueArea.syncing(venue):
+    return
+  if not (attrs.city.history.has_changes() or attrs.state.history.has_changes()):
+    return
+
+  def previous(attr):
+    return attr.history.deleted[0] if attr.history.deleted else attr.value
+
+  VenueArea.adjust(connection, previous(attrs.city), previous(attrs.state), -1)
+  VenueArea.adjust(connection, venue.city, venue.state, 1)
 
 class Artist(db.Model):
     __tablename__ = 'Artists'
+    __table_args__ = (
+      db.Index('ix_artists_name_id', 'name', 'id'),
+      db.Index('ix_artists_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name', lazy=True)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String)
+    # See Venue.upcoming_shows_count.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
-    @property
-    def past_shows(self):
-      past_shows = list(
-        filter(lambda s: s.start_time < datetime.now(), self.shows)
-      )
-      return [{
-        'venue_id': show.venue.id,
-        'venue_name': show.venue.name,
-        'venue_image_link': show.venue.image_link,
-        'start_time': show.start_time.isoformat()
-      } for show in past_shows]
+    @classmethod
+    def listing_key(cls):
+      # Unique sort key of the listing, served by ix_artists_name_id.
+      return (cls.name, cls.id)
 
-    @property
-    def upcoming_shows(self):
-      upcoming_shows = list(
-        filter(lambda s: s.start_time >= datetime.now(), self.shows)
+    @classmethod
+    def listing_query(cls):
+      # The columns of read_models.ArtistItem, in order.
+      return db.session.query(cls.id, cls.name)
+
+    @classmethod
+    def in_genres(cls, genre_ids):
+      # Filter criterion served by ix_artist_genres_genre_id.
+      return cls.id.in_(
+        db.select([artist_genres.c.artist_id]).where(artist_genres.c.genre_id.in_(genre_ids))
       )
 
-      return [{
-        'venue_id': show.venue.id,
-        'venue_name': show.venue.name,
-        'venue_image_link': show.venue.image_link,
-        'start_time': show.start_time.isoformat()
-      } for show in upcoming_shows]
+    @staticmethod
+    def _show_columns():
+      return (Show.start_time, Venue.id, Venue.name, Venue.image_link)
+
+    @staticmethod
+    def _show_rows(rows):
+      return [(start_time, {
+        'venue_id': venue_id,
+        'venue_name': venue_name,
+        'venue_image_link': venue_image_link,
+        'start_time': start_time
+      }) for start_time, venue_id, venue_name, venue_image_link in rows
+        if start_time is not None]
+
+    @classmethod
+    def detail_statement(cls, artist_id):
+      # One joined query for the artist and all of its shows. A plain
+      # statement, so async_api.py runs it on the asyncio engine too.
+      return db.select([cls, *cls._show_columns()]) \
+        .options(db.selectinload(cls.genres)) \
+        .outerjoin(Show, Show.artist_id == cls.id) \
+        .outerjoin(Venue, Venue.id == Show.venue_id) \
+        .where(cls.id == artist_id) \
+        .order_by(Show.start_time)
+
+    @classmethod
+    def detail_from_rows(cls, rows, now=None):
+      # The format() dict from the rows of detail_statement(), or None when
+      # the artist does not exist.
+      if not rows:
+        return None
+
+      shows = cls._show_rows(row[1:] for row in rows)
+      return rows[0][0].format(shows=shows, now=now)
+
+    @classmethod
+    def load_detail(cls, artist_id, now=None):
+      rows = db.session.execute(cls.detail_statement(artist_id)).all()
+      return cls.detail_from_rows(rows, now)
+
+    @classmethod
+    def version_statement(cls, artist_id, now=None):
+      # Everything the detail page depends on: the artist's own timestamp
+      # (bumped by its show writes too), its venues' timestamps, the show
+      # count and the next show to move from upcoming to past. No row when
+      # the artist does not exist.
+      now = now or datetime.now()
+      return db.select([
+          cls.updated_at,
+          db.func.max(Venue.updated_at).label('related_updated_at'),
+          db.func.count(Show.id).label('show_count'),
+          db.func.min(db.case((Show.start_time >= now, Show.start_time))).label('next_show')
+        ]) \
+        .outerjoin(Show, Show.artist_id == cls.id) \
+        .outerjoin(Venue, Venue.id == Show.venue_id) \
+        .where(cls.id == artist_id) \
+        .group_by(cls.id, cls.updated_at)
+
+    @classmethod
+    def version(cls, artist_id, now=None):
+      return db.session.execute(cls.version_statement(artist_id, now)).first()
+
+    def load_shows(self):
+      rows = db.session.query(*self._show_columns()) \
+        .join(Venue, Venue.id == Show.venue_id) \
+        .filter(Show.artist_id == self.id) \
+        .order_by(Show.start_time) \
+        .all()
+      return self._show_rows(rows)
 
     @property
-    def past_shows_count(self):
-      try:
-        return len(self.past_shows)
-      except:
-        return 0
+    def past_shows(self):
+      return partition_shows(self.load_shows())[0]
 
     @property
-    def upcoming_shows_count(self):
-      try:
-        return len(self.upcoming_shows)
-      except:
-        return 0
+    def upcoming_shows(self):
+      return partition_shows(self.load_shows())[1]
 
     def update_db(self):
       db.session.commit()
 
-    def format(self):
+    def format(self, shows=None, now=None):
+      if shows is None:
+        shows = self.load_shows()
+      past_shows, upcoming_shows = partition_shows(shows, now)
+
       return {
         'id': self.id,
         'name': self.name,
         'city': self.city,
         'state': self.state,
         'phone': self.phone,
-        'genres': self.genres.split(', '),
+        'genres': [genre.name for genre in self.genres],
         'image_link': self.image_link,
         'facebook_link': self.facebook_link,
         'website': self.website_link,
         'seeking_venue': self.seeking_venue,
         'seeking_description': self.seeking_description,
-        'past_shows_count': self.past_shows_count,
-        'past_shows': self.past_shows,
-        'upcoming_shows_count': self.upcoming_shows_count,
-        'upcoming_shows': self.upcoming_shows
+        'past_shows_count': len(past_shows),
+        'past_shows': past_shows,
+        'upcoming_shows_count': len(upcoming_shows),
+        'upcoming_shows': upcoming_shows
       }
 
     def __getitem__(self, key):
@@ -165,6 +512,14 @@ class Artist(db.Model):
 
 class Show(db.Model):
   __tablename__ = 'Shows'
+  __table_args__ = (
+    db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('uq_shows_artist_id_venue_id_start_time',
+             'artist_id', 'venue_id', 'start_time', unique=True),
+    db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+    db.Index('ix_shows_updated_at', 'updated_at'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   artist_id = db.Column(db.Integer, db.ForeignKey('Artists.id'), nullable=False)
@@ -172,6 +527,30 @@ class Show(db.Model):
   venue = db.relationship('Venue', backref='shows', lazy=True)
   artist = db.relationship('Artist', backref='shows', lazy=True)
   start_time = db.Column(db.DateTime)
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+  @staticmethod
+  def listing_key():
+    # Unique sort key of the listing (newest first), served by
+    # ix_shows_start_time_id.
+    return (Show.start_time, Show.id)
+
+  @staticmethod
+  def listing_query():
+    # Projection of everything the show tiles need, joined in one query;
+    # the columns of read_models.ShowItem, in order.
+    return db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link')
+      ) \
+      .join(Venue, Venue.id == Show.venue_id) \
+      .join(Artist, Artist.id == Show.artist_id) \
+      .filter(Show.start_time.isnot(None))
 
   def format(self):
     return {
@@ -180,5 +559,183 @@ class Show(db.Model):
       'artist_id': self.artist_id,
       'artist_name': self.artist.name,
       'artist_image_link': self.artist.image_link,
-      'start_time': self.start_time.isoformat()
-    }
\ No newline at end of file
+      'start_time': self.start_time
+    }
+
+
+class ShowRollover(db.Model):
+    # Watermark of the stored show counters: a show is counted as upcoming
+    # while its start_time is at or after rolled_over_at, which
+    # `flask rollover-shows` advances. A single row, id 1.
+    __tablename__ = 'ShowRollovers'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_over_at = db.Column(db.DateTime, nullable=False)
+
+    @classmethod
+    def watermark(cls):
+      # As an SQL expression, so counting needs no extra round trip; now
+      # until the first rollover.
+      return db.func.coalesce(
+        db.select([cls.rolled_over_at]).where(cls.id == 1).scalar_subquery(),
+        db.literal(datetime.now(), db.DateTime)
+      )
+
+@db.event.listens_for(Venue, 'before_update')
+@db.event.listens_for(Artist, 'before_update')
+def _touch(mapper, connection, target):
+  # Fires for genre-only edits too, which issue no UPDATE of their own.
+  target.updated_at = datetime.utcnow()
+
+COUNTED_BY = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+def _show_counts(table, key, watermark):
+  # Correlated counts of the table row's shows either side of the watermark;
+  # each is a range scan of ix_shows_venue_id_start_time / _artist_id_.
+  def count(*criteria):
+    return db.select([db.func.count(Show.id)]) \
+      .where(key == table.c.id) \
+      .where(*criteria) \
+      .scalar_subquery()
+  return {
+    'upcoming_shows_count': count(Show.start_time >= watermark),
+    'past_shows_count': count(Show.start_time < watermark)
+  }
+
+def touch_parents(connection, venue_ids, artist_ids):
+  # Bumps the venues and artists whose pages list a changed show and
+  # recounts their stored show counters, one UPDATE per table.
+  now = datetime.utcnow()
+  watermark = ShowRollover.watermark()
+  for (model, key), ids in zip(COUNTED_BY, (venue_ids, artist_ids)):
+    ids = {id for id in ids if id is not None}
+    if ids:
+      table = model.__table__
+      connection.execute(
+        table.update()
+          .where(table.c.id.in_(ids))
+          .values(updated_at=now, **_show_counts(table, key, watermark))
+      )
+
+def reconcile_show_counts(connection):
+  # Recounts every stored counter from Shows; returns the number of venues
+  # and artists whose counts had drifted.
+  now = datetime.utcnow()
+  watermark = ShowRollover.watermark()
+  repaired = 0
+  for model, key in COUNTED_BY:
+    table = model.__table__
+    counts = _show_counts(table, key, watermark)
+    repaired += connection.execute(
+      table.update()
+        .where(db.or_(*(table.c[name] != count for name, count in counts.items())))
+        .values(updated_at=now, **counts)
+    ).rowcount
+  return repaired
+
+def rollover_shows(connection, now=None):
+  # Moves the shows that started since the last rollover from the upcoming
+  # to the past counters, one set-based UPDATE per table, and advances the
+  # watermark. Returns the number of shows moved.
+  now = now or datetime.now()
+  rollovers = ShowRollover.__table__
+  watermark = connection.execute(
+    db.select([rollovers.c.rolled_over_at]).where(rollovers.c.id == 1).with_for_update()
+  ).scalar()
+  if watermark is None:
+    connection.execute(rollovers.insert().values(id=1, rolled_over_at=now))
+    reconcile_show_counts(connection)
+    return 0
+  if now <= watermark:
+    return 0
+
+  started = (Show.start_time >= watermark) & (Show.start_time < now)
+  moved = connection.execute(db.select([db.func.count(Show.id)]).where(started)).scalar()
+  if moved:
+    touched = datetime.utcnow()
+    for model, key in COUNTED_BY:
+      table = model.__table__
+      count = db.select([db.func.count(Show.id)]) \
+        .where(key == table.c.id) \
+        .where(started) \
+        .scalar_subquery()
+      connection.execute(
+        table.update()
+          .where(table.c.id.in_(db.select([key]).where(started)))
+          .values(
+            upcoming_shows_count=table.c.upcoming_shows_count - count,
+            past_shows_count=table.c.past_shows_count + count,
+            updated_at=touched
+          )
+      )
+  connection.execute(rollovers.update().where(rollovers.c.id == 1).values(rolled_over_at=now))
+  return moved
+
+@db.event.listens_for(Show, 'after_insert')
+@db.event.listens_for(Show, 'after_delete')
+def _show_written(mapper, connection, show):
+  touch_parents(connection, [show.venue_id], [show.artist_id])
+
+@db.event.listens_for(Show, 'before_update')
+def _show_updating(mapper, connection, show):
+  show.updated_at = datetime.utcnow()
+
+@db.event.listens_for(Show, 'after_update')
+def _show_updated(mapper, connection, show):
+  # After the UPDATE, so the recount sees the new venue and start time.
+  attrs = db.inspect(show).attrs
+  touch_parents(
+    connection,
+    [show.venue_id, *attrs.venue_id.history.deleted],
+    [show.artist_id, *attrs.artist_id.history.deleted]
+  )
+
+class TableDeletion(db.Model):
+    # Rows deleted so far per table. MAX(updated_at) moves whenever a row is
+    # written or added but not when one is removed; this counter covers
+    # that, so a listing's version never has to count its table.
+    __tablename__ = 'TableDeletions'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    deletions = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def bump(cls, connection, table_name):
+      deletions = cls.__table__
+      insert = UPSERT_INSERTS.get(connection.dialect.name)
+      if insert is not None:
+        connection.execute(insert(deletions).values(table_name=table_name, deletions=1)
+          .on_conflict_do_update(
+            index_elements=[deletions.c.table_name],
+            set_={'deletions': deletions.c.deletions + 1}
+          ))
+        return
+      updated = connection.execute(
+        deletions.update()
+          .where(deletions.c.table_name == table_name)
+          .values(deletions=deletions.c.deletions + 1)
+      ).rowcount
+      if not updated:
+        connection.execute(deletions.insert().values(table_name=table_name, deletions=1))
+
+@db.event.listens_for(Venue, 'after_delete')
+@db.event.listens_for(Artist, 'after_delete')
+@db.event.listens_for(Show, 'after_delete')
+def _row_deleted(mapper, connection, target):
+  TableDeletion.bump(connection, mapper.local_table.name)
+
+def listing_version(*models):
+  # (latest updated_at, deletions) per model, in one round trip: an index
+  # lookup on ix_*_updated_at and a primary key lookup each. Changes
+  # whenever a row is written, added or removed.
+  deletions = TableDeletion.__table__
+  columns = []
+  for model in models:
+    columns.append(db.select([db.func.max(model.updated_at)]).scalar_subquery())
+    columns.append(db.func.coalesce(
+      db.select([deletions.c.deletions])
+        .where(deletions.c.table_name == model.__tablename__)
+        .scalar_subquery(),
+      0
+    ))
+  return db.session.query(*columns).one()
@@ -0,0 +1,95 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, tuple_
+
+#----------------------------------------------------------------------------#
+# Keyset (seek) pagination.
+#
+# Pages are addressed by the sort key of the row at the page edge instead of
+# an OFFSET, so every page costs one index range scan however deep it is.
+# The sort key must be unique, which is why every key ends with the id.
+#----------------------------------------------------------------------------#
+
+class Page:
+  def __init__(self, items, next_cursor=None, prev_cursor=None, params=None):
+    self.items = items
+    self.next_cursor = next_cursor
+    self.prev_cursor = prev_cursor
+    # Extra query arguments (filters) the pager links carry along.
+    self.params = {key: value for key, value in (params or {}).items() if value}
+
+  def __iter__(self):
+    return iter(self.items)
+
+  def __len__(self):
+    return len(self.items)
+
+def _default(value):
+  if isinstance(value, datetime):
+    return value.isoformat()
+  raise TypeError(f'Cannot encode {value!r} in a cursor')
+
+def encode_cursor(values, direction):
+  payload = json.dumps({'v': list(values), 'd': direction}, default=_default)
+  return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, columns):
+  # Returns (values, direction), or (None, 'next') for a missing or
+  # malformed cursor so callers fall back to the first page.
+  if not cursor:
+    return None, 'next'
+  try:
+    padded = cursor + '=' * (-len(cursor) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    values, direction = payload['v'], payload['d']
+    if direction not in ('next', 'prev') or len(values) != len(columns):
+      raise ValueError(cursor)
+    values = [
+      datetime.fromisoformat(value)
+      if value is not None and isinstance(column.type, DateTime) else value
+      for column, value in zip(columns, values)
+    ]
+  except (binascii.Error, KeyError, TypeError, ValueError):
+    return None, 'next'
+  return values, direction
+
+def seek_query(query, columns, values, limit, descending=False, backwards=False):
+  # The query for one page: rows strictly past values (when given) in the
+  # direction of travel, ordered so the sort key index is read in order.
+  reverse = descending != backwards
+  if values is not None:
+    key, edge = tuple_(*columns), tuple_(*values)
+    query = query.filter(key < edge if reverse else key > edge)
+
+  order = [column.desc() if reverse else column.asc() for column in columns]
+  return query.order_by(*order).limit(limit)
+
+def keyset_paginate(query, columns, cursor=None, per_page=50, descending=False,
+                    params=None, item_type=None):
+  # columns: the unique sort key, e.g. (Artist.name, Artist.id). Each must
+  # be selected by the query under its own key so it can be read back off
+  # the edge rows. item_type: a read model the rows are copied into.
+  values, direction = decode_cursor(cursor, columns)
+  backwards = direction == 'prev'
+  rows = seek_query(query, columns, values, per_page + 1, descending, backwards).all()
+
+  has_more = len(rows) > per_page
+  rows = rows[:per_page]
+  if backwards:
+    rows.reverse()
+  if item_type is not None:
+    rows = list(map(item_type._make, rows))
+
+  def edge_cursor(row, direction):
+    return encode_cursor([getattr(row, column.key) for column in columns], direction)
+
+  next_cursor = prev_cursor = None
+  if rows:
+    if has_more or backwards:
+      next_cursor = edge_cursor(rows[-1], 'next')
+    if values is not None and (has_more or not backwards):
+      prev_cursor = edge_cursor(rows[0], 'prev')
+  return Page(rows, next_cursor, prev_cursor, params)
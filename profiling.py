@@ -0,0 +1,153 @@
+import time
+
+from flask import g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Request profiling (PROFILE_REQUESTS).
+#
+# Counts and times every SQL statement and the template render of each
+# request, returns the totals in a Server-Timing header, and logs requests
+# slower than SLOW_REQUEST_MS with their statements through app.logger,
+# which writes to error.log outside debug mode.
+#
+# A streamed page (streaming.py) renders after its headers have gone out:
+# its Server-Timing header has no render entry, and the slow-request check
+# runs when the response is closed, with the render timed.
+#----------------------------------------------------------------------------#
+
+class RequestProfile:
+  def __init__(self, max_statements):
+    self.started = time.perf_counter()
+    self.queries = 0
+    self.db_time = 0.0
+    self.render_time = 0.0
+    self.statements = []
+    self.max_statements = max_statements
+
+  def record_query(self, statement, elapsed):
+    self.queries += 1
+    self.db_time += elapsed
+    if len(self.statements) < self.max_statements:
+      self.statements.append((elapsed, statement))
+
+  @property
+  def elapsed(self):
+    return time.perf_counter() - self.started
+
+  def server_timing(self, streamed=False):
+    timings = [f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"']
+    if not streamed:
+      timings.append(f'render;dur={self.render_time * 1000:.1f}')
+    timings.append(f'total;dur={self.elapsed * 1000:.1f}')
+    return ', '.join(timings)
+
+def current_profile():
+  if has_request_context():
+    return g.get('profile')
+  return None
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  started = conn.info['query_started'].pop()
+  profile = current_profile()
+  if profile is not None:
+    profile.record_query(statement, time.perf_counter() - started)
+
+def _handle_error(context):
+  # A failed statement never reaches after_cursor_execute.
+  if context.connection is not None and context.cursor is not None:
+    started = context.connection.info.get('query_started')
+    if started:
+      started.pop()
+
+def render_listeners(environment):
+  # Called with (template name, seconds) after every render of the app's
+  # templates; metrics.py registers one per app.
+  return environment.app.extensions.get('render_listeners', ())
+
+def add_render_listener(app, listener):
+  app.jinja_env.template_class = ProfiledTemplate
+  app.extensions.setdefault('render_listeners', []).append(listener)
+
+class ProfiledTemplate(Template):
+  # Times the top-level render of every template loaded by the app.
+  def render(self, *args, **kwargs):
+    started = time.perf_counter()
+    try:
+      return super().render(*args, **kwargs)
+    finally:
+      elapsed = time.perf_counter() - started
+      profile = current_profile()
+      if profile is not None:
+        profile.render_time += elapsed
+      for listener in render_listeners(self.environment):
+        listener(self.name, elapsed)
+
+  def generate(self, *args, **kwargs):
+    # Streamed renders (streaming.py). Time spent sending each chunk is not
+    # counted.
+    pieces = super().generate(*args, **kwargs)
+    elapsed = 0.0
+    while True:
+      started = time.perf_counter()
+      try:
+        piece = next(pieces)
+      except StopIteration:
+        break
+      finally:
+        elapsed += time.perf_counter() - started
+      yield piece
+    profile = current_profile()
+    if profile is not None:
+      profile.render_time += elapsed
+    for listener in render_listeners(self.environment):
+      listener(self.name, elapsed)
+
+def init_profiling(app):
+  if not app.config.get('PROFILE_REQUESTS'):
+    return
+
+  max_statements = app.config.get('PROFILE_MAX_STATEMENTS', 100)
+
+  event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+  event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+  event.listen(Engine, 'handle_error', _handle_error)
+  app.jinja_env.template_class = ProfiledTemplate
+
+  @app.before_request
+  def start_profile():
+    g.profile = RequestProfile(max_statements)
+
+  def log_if_slow(profile, method, path):
+    if profile.elapsed * 1000 < app.config.get('SLOW_REQUEST_MS', 500):
+      return
+    lines = [f'  {elapsed * 1000:8.1f}ms  {" ".join(statement.split())}'
+             for elapsed, statement in profile.statements]
+    if profile.queries > len(profile.statements):
+      lines.append(f'  ... {profile.queries - len(profile.statements)} more')
+    app.logger.warning(
+      'Slow request %s %s: %.0fms, %d queries in %.0fms, render %.0fms\n%s',
+      method, path, profile.elapsed * 1000, profile.queries,
+      profile.db_time * 1000, profile.render_time * 1000, '\n'.join(lines)
+    )
+
+  @app.after_request
+  def finish_profile(response):
+    profile = g.get('profile')
+    if profile is None:
+      return response
+    response.headers['Server-Timing'] = profile.server_timing(response.is_streamed)
+    method, path = request.method, request.full_path.rstrip('?')
+    if response.is_streamed:
+      # g.profile stays set so the render and any queries made while the
+      # body is generated are counted; the body is done once it is closed.
+      response.call_on_close(lambda: log_if_slow(profile, method, path))
+    else:
+      g.pop('profile')
+      log_if_slow(profile, method, path)
+    return response
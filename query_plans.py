@@ -0,0 +1,122 @@
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from extensions import db
+from models import Venue, Artist, Show
+from pagination import seek_query
+
+#----------------------------------------------------------------------------#
+# Query plan checks.
+#
+# Runs EXPLAIN over the app's hot queries and reports any that fall back to
+# a sequential scan of a table. The planner's choice depends on the data and
+# its statistics -- on a near-empty table a sequential scan is the cheapest
+# plan and is rightly picked -- so run it on realistic data: benchmarks/
+# plans.py seeds and ANALYZEs a fresh database first. SQLite plans come from
+# EXPLAIN QUERY PLAN.
+#----------------------------------------------------------------------------#
+
+Area = namedtuple('Area', 'city state')
+
+def main_queries(venue_id=None, artist_id=None):
+  # The statements behind the detail pages, listings and search counts,
+  # built exactly as the views build them.
+  venue_id = venue_id or db.session.query(db.func.min(Venue.id)).scalar() or 1
+  artist_id = artist_id or db.session.query(db.func.min(Artist.id)).scalar() or 1
+  now = datetime.now()
+  area = db.session.query(Venue.city, Venue.state).filter(Venue.id == venue_id).first() \
+    or Area('', '')
+
+  return {
+    'venue detail': Venue.detail_statement(venue_id),
+    'artist detail': Artist.detail_statement(artist_id),
+    # The per-row recounts of touch_parents() and the rollover's window.
+    'venue show counts': db.session.query(db.func.count(Show.id))
+      .filter(Show.venue_id == venue_id, Show.start_time >= now),
+    'artist show counts': db.session.query(db.func.count(Show.id))
+      .filter(Show.artist_id == artist_id, Show.start_time >= now),
+    'rollover window': db.session.query(Show.venue_id, Show.artist_id)
+      .filter(Show.start_time >= now - timedelta(hours=1), Show.start_time < now),
+    'shows page': seek_query(
+      Show.listing_query(), Show.listing_key(), None, 50, descending=True
+    ),
+    'shows next page': seek_query(
+      Show.listing_query(), Show.listing_key(), [now, 0], 50, descending=True
+    ),
+    'artists page': seek_query(Artist.listing_query(), Artist.listing_key(), None, 50),
+    'artists next page': seek_query(
+      Artist.listing_query(), Artist.listing_key(), ['', 0], 50
+    ),
+    'venue areas page': seek_query(*Venue.areas_query(), None, 20),
+    'venues in areas': Venue.area_venues_query([area], 10),
+    'venues in one area': seek_query(
+      Venue.listing_query().filter(Venue.in_areas([area])),
+      Venue.listing_key(), None, 50
+    ),
+  }
+
+class Explain(Executable, ClauseElement):
+  # EXPLAIN <statement>, compiled and bound like the statement itself.
+  inherit_cache = False
+
+  def __init__(self, statement, prefix):
+    self.statement = statement
+    self.prefix = prefix
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+  return f'{element.prefix} {compiler.process(element.statement, **kw)}'
+
+def explain(query):
+  # Plan lines for an ORM query or a select(), using the dialect's own
+  # EXPLAIN.
+  dialect = db.engine.dialect.name
+  connection = db.session.connection()
+  statement = getattr(query, 'statement', query)
+  if dialect == 'postgresql':
+    rows = connection.execute(Explain(statement, 'EXPLAIN')).fetchall()
+    return [row[0] for row in rows]
+  if dialect == 'sqlite':
+    rows = connection.execute(Explain(statement, 'EXPLAIN QUERY PLAN')).fetchall()
+    return [row[-1] for row in rows]
+  raise NotImplementedError(f'No EXPLAIN support for {dialect}')
+
+SEQ_SCAN_PATTERNS = {
+  'postgresql': re.compile(r'Seq Scan on "?(\w+)"?'),
+  'sqlite': re.compile(r'^SCAN "?(\w+)"?(?!\w)(?! USING)(?! VIRTUAL TABLE)')
+}
+
+def sequential_scans(plan):
+  # Plan lines that read a whole table without an index. Scans of derived
+  # tables (subqueries) and virtual FTS tables are not counted.
+  pattern = SEQ_SCAN_PATTERNS[db.engine.dialect.name]
+  tables = db.metadata.tables
+  scans = []
+  for line in plan:
+    match = pattern.search(line.strip())
+    if match and match.group(1) in tables:
+      scans.append(line.strip())
+  return scans
+
+def check_query_plans(queries=None):
+  # {name: [offending plan lines]} for every query that scans a table.
+  queries = queries or main_queries()
+  try:
+    failures = {}
+    for name, query in queries.items():
+      scans = sequential_scans(explain(query))
+      if scans:
+        failures[name] = scans
+    return failures
+  finally:
+    db.session.rollback()
+
+def assert_no_sequential_scans(queries=None):
+  failures = check_query_plans(queries)
+  if failures:
+    lines = [f'{name}: {"; ".join(scans)}' for name, scans in failures.items()]
+    raise AssertionError('Sequential scans found:\n' + '\n'.join(lines))
@@ -0,0 +1,23 @@
+from collections import namedtuple
+
+#----------------------------------------------------------------------------#
+# Read models for the listing, search and show-grid pages.
+#
+# The listing queries select only the columns a page shows, and each row is
+# copied straight into one of these named tuples: no ORM instance, identity
+# map entry or per-row dict. Templates read them by attribute and the API
+# turns them into dicts with _asdict(). Field order must match the columns
+# of the query a tuple is built from (see the listing queries in models.py).
+#----------------------------------------------------------------------------#
+
+ArtistItem = namedtuple('ArtistItem', ('id', 'name'))
+
+VenueItem = namedtuple('VenueItem', ('id', 'name', 'city', 'state'))
+
+ShowItem = namedtuple('ShowItem', (
+  'id', 'start_time',
+  'venue_id', 'venue_name',
+  'artist_id', 'artist_name', 'artist_image_link'
+))
+
+SearchItem = namedtuple('SearchItem', ('id', 'name', 'num_upcoming_shows'))
@@ -0,0 +1,72 @@
+import random
+import time
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+
+#----------------------------------------------------------------------------#
+# Read-replica routing.
+#
+# Replicas are SQLALCHEMY_BINDS whose key starts with 'replica'. A GET/HEAD
+# request picks one of them for all of its reads; flushes, DML statements and
+# anything after the session has written go to the primary, as does every
+# request outside a request context (CLI, migrations). After a successful
+# write a visitor's session is pinned to the primary for
+# REPLICA_STICKY_SECONDS so they read their own change despite replica lag.
+# Other visitors can still read a lagging replica; a detail page is cached
+# under the version read from the same replica, so a lagging copy is never
+# served once the newer version is seen. The search pages still accept the
+# POST their old forms sent, but are read like a GET and never pin.
+#----------------------------------------------------------------------------#
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Endpoints that only read, whatever the method.
+READ_ENDPOINTS = ('views.search_venues', 'views.search_artists')
+
+def _is_read(request):
+  return request.method in READ_METHODS or request.endpoint in READ_ENDPOINTS
+
+def replica_binds(app):
+  binds = app.config.get('SQLALCHEMY_BINDS') or {}
+  return sorted(key for key in binds if key.startswith('replica'))
+
+def _read_bind():
+  if not has_request_context():
+    return None
+  return g.get('read_bind')
+
+class RoutingSession(SignallingSession):
+  def get_bind(self, mapper=None, clause=None):
+    bind = _read_bind()
+    if bind is None or self._flushing or self.info.get('wrote') \
+        or getattr(clause, 'is_dml', False):
+      return super().get_bind(mapper, clause)
+    return get_state(self.app).db.get_engine(self.app, bind=bind)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, context):
+  # Reads later in the same session must see the uncommitted rows.
+  session.info['wrote'] = True
+
+class RoutingSQLAlchemy(SQLAlchemy):
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+def init_routing(app):
+  replicas = replica_binds(app)
+  if not replicas:
+    return
+  sticky = app.config.get('REPLICA_STICKY_SECONDS', 10)
+
+  @app.before_request
+  def choose_read_bind():
+    if _is_read(request) and session.get('primary_until', 0) < time.time():
+      g.read_bind = random.choice(replicas)
+
+  @app.after_request
+  def pin_writer_to_primary(response):
+    if not _is_read(request) and response.status_code < 400:
+      session['primary_until'] = time.time() + sticky
+    return response
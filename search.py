@@ -0,0 +1,144 @@
+from sqlalchemy import func, literal_column, or_, select, text
+
+from extensions import db
+from models import Venue, Artist, Genre
+from read_models import SearchItem
+
+#----------------------------------------------------------------------------#
+# Indexed venue / artist search.
+#
+# Postgres: the concatenated search document is covered by a pg_trgm GIN
+# expression index (see migration 023c772f9ab8), so ILIKE '%word%' filters
+# are index scans. SQLite: an FTS5 table per model kept in sync by triggers.
+# Any other backend, or a SQLite database without the FTS tables, falls back
+# to plain ILIKE over the same document. Genres live in their own tables, so
+# a word also matches rows tagged with any genre whose name contains it.
+#----------------------------------------------------------------------------#
+
+SEARCH_COLUMNS = ('name', 'city', 'state')
+
+# Column weights for bm25(), in SEARCH_COLUMNS order. Name hits rank first.
+FTS_WEIGHTS = '10.0, 2.0, 2.0'
+
+def fts_table(model):
+  return f'{model.__tablename__.lower()}_fts'
+
+def search_document(model):
+  # Must render exactly like the indexed expression in the migration:
+  # coalesce(name, '') || ' ' || coalesce(city, '') || ...
+  parts = [
+    func.coalesce(getattr(model, column), literal_column("''"))
+    for column in SEARCH_COLUMNS
+  ]
+  document = parts[0]
+  for part in parts[1:]:
+    document = document.op('||')(literal_column("' '")).op('||')(part)
+  return document
+
+def create_fts_tables(bind):
+  # Idempotently creates (and rebuilds) the SQLite FTS5 tables and the
+  # triggers that keep them in step with Venues and Artists.
+  for model in (Venue, Artist):
+    table, source = fts_table(model), model.__tablename__
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    statements = [
+      f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5('
+      f"{columns}, content='{source}', content_rowid='id')",
+      f'CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON "{source}" BEGIN '
+      f'INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new_values}); END',
+      f'CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON "{source}" BEGIN '
+      f"INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+      f'CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE ON "{source}" BEGIN '
+      f"INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+      f'INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new_values}); END',
+      f"INSERT INTO {table}({table}) VALUES ('rebuild')"
+    ]
+    for statement in statements:
+      bind.execute(text(statement))
+
+def fts_exists_statement(model):
+  return text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name") \
+    .bindparams(name=fts_table(model))
+
+def _has_fts(session, model):
+  return session.execute(fts_exists_statement(model)).first() is not None
+
+def _fts_term(word):
+  # A quoted prefix term, so user input is never parsed as FTS5 syntax.
+  return '"{}"*'.format(word.replace('"', '""'))
+
+def _fts_match(model, query):
+  table = fts_table(model)
+  return model.id.in_(
+    select([literal_column(f'{table}.rowid')])
+      .select_from(text(table))
+      .where(literal_column(table).op('MATCH')(query))
+  )
+
+def _fts_rank(model, words):
+  # bm25() of the rows matching any of the words; rows that only match on a
+  # genre have no rank and sort after those that do.
+  table = fts_table(model)
+  return select([literal_column(f'bm25({table}, {FTS_WEIGHTS})')]) \
+    .select_from(text(table)) \
+    .where(literal_column(table).op('MATCH')(' OR '.join(_fts_term(word) for word in words))) \
+    .where(literal_column(f'{table}.rowid') == model.id) \
+    .as_scalar()
+
+def _word_filter(model, word, fts, genre_map):
+  if fts:
+    criterion = _fts_match(model, _fts_term(word))
+  else:
+    criterion = search_document(model).ilike(f'%{word}%')
+
+  genre_ids = Genre.matching(word, genre_map)
+  if genre_ids:
+    criterion = or_(criterion, model.in_genres(genre_ids))
+  return criterion
+
+def search_statements(model, words, page, per_page, dialect, fts, genre_map):
+  # (count, rows) statements for one page of ranked results; the rows are
+  # the columns of read_models.SearchItem, in order. Shared with the async
+  # API (async_api.py).
+  query = select([model.id, model.name, model.upcoming_shows_count])
+  for word in words:
+    query = query.where(_word_filter(model, word, fts, genre_map))
+  count = select([func.count()]).select_from(query.subquery())
+
+  if fts:
+    rank = _fts_rank(model, words)
+    query = query.order_by(rank.is_(None), rank)
+  elif dialect == 'postgresql' and words:
+    # pg_trgm similarity of the name against the full term ranks exact and
+    # near-exact name hits above matches on city, state or genre only.
+    name = func.coalesce(model.name, literal_column("''"))
+    query = query.order_by(func.similarity(name, ' '.join(words)).desc())
+  rows = query.order_by(model.name, model.id) \
+    .limit(per_page) \
+    .offset((page - 1) * per_page)
+  return count, rows
+
+def search_result(total, rows, page, per_page):
+  # The {'count', 'data'} structure the search templates expect.
+  return {
+    'count': total,
+    'page': page,
+    'pages': max((total + per_page - 1) // per_page, 1),
+    'data': list(map(SearchItem._make, rows))
+  }
+
+def search(model, term, page=1, per_page=20):
+  # One page of ranked results for the search term.
+  words = (term or '').split()
+  page = max(page, 1)
+  dialect = db.engine.dialect.name
+  fts = dialect == 'sqlite' and bool(words) and _has_fts(db.session, model)
+
+  count, rows = search_statements(
+    model, words, page, per_page, dialect, fts, Genre.name_map() if words else {}
+  )
+  return search_result(
+    db.session.execute(count).scalar(), db.session.execute(rows).all(), page, per_page
+  )
@@ -2,3 +2,17 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Show times rendered with DATETIME_RENDERING = 'client'; the moment.js
+// equivalents of the Babel patterns in views.py.
+window.DATETIME_FORMATS = {
+  full: 'dddd MMMM, D, YYYY [at] h:mmA',
+  medium: 'ddd MM, DD, YYYY h:mmA'
+};
+
+document.querySelectorAll('time[data-format]').forEach(function (element) {
+  var format = window.DATETIME_FORMATS[element.getAttribute('data-format')];
+  if (format) {
+    element.textContent = moment(element.getAttribute('datetime')).format(format);
+  }
+});
@@ -0,0 +1,42 @@
+from flask import Response, current_app, render_template, stream_with_context
+
+#----------------------------------------------------------------------------#
+# Streamed page rendering (STREAM_TEMPLATES).
+#
+# stream_page() renders a template chunk by chunk as the response body is
+# sent, so the browser gets the layout head and the first rows while the
+# rest of the page is still being rendered, and the full HTML string never
+# exists in memory. Jinja yields a piece per template node; they are joined
+# into STREAM_CHUNK_SIZE chunks so each write (and each compressed flush,
+# see compression.py) carries a useful amount of markup.
+#
+# The view's queries still run before the first byte: stream only pages
+# whose context is already loaded, as the listings are (read-model tuples,
+# no lazy loads). An error halfway through the render cuts the page short
+# instead of showing the 500 page.
+#----------------------------------------------------------------------------#
+
+def _chunks(pieces, chunk_size):
+  buffer, size = [], 0
+  for piece in pieces:
+    buffer.append(piece)
+    size += len(piece)
+    if size >= chunk_size:
+      yield ''.join(buffer)
+      buffer, size = [], 0
+  if buffer:
+    yield ''.join(buffer)
+
+def stream_page(template_name, **context):
+  # render_template()'s streaming counterpart; falls back to it with
+  # STREAM_TEMPLATES off.
+  app = current_app._get_current_object()
+  if not app.config['STREAM_TEMPLATES']:
+    return render_template(template_name, **context)
+  app.update_template_context(context)
+  template = app.jinja_env.get_or_select_template(template_name)
+  pieces = template.generate(context)
+  return Response(
+    stream_with_context(_chunks(pieces, app.config['STREAM_CHUNK_SIZE'])),
+    mimetype='text/html'
+  )
@@ -0,0 +1,511 @@
+import functools
+import itertools
+from datetime import datetime, timezone
+
+from flask import Blueprint, Response, abort, current_app, flash, jsonify, redirect, \
+  render_template, request, stream_with_context, url_for
+from markupsafe import Markup
+
+import cache
+import exporter
+import importer
+from booking import book_shows, parse_show
+from cache import cached_page
+from conditional import conditional, current_version, detail_version, listings_version
+from extensions import db
+from forms import ArtistForm, ShowForm, VenueForm
+from models import Venue, Artist, Show, Genre
+from pagination import keyset_paginate
+from read_models import ArtistItem, ShowItem, VenueItem
+from search import search
+from streaming import stream_page
+
+views = Blueprint('views', __name__)
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+
+@functools.lru_cache(maxsize=32)
+def _datetime_pattern(format, locale):
+  import babel
+  import babel.dates
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), \
+    babel.Locale.parse(locale)
+
+@functools.lru_cache(maxsize=4096)
+def _format_datetime(value, format, locale):
+  # Pages repeat the same few start times, so whole results are cached too.
+  pattern, locale = _datetime_pattern(format, locale)
+  if value.tzinfo is None:
+    value = value.replace(tzinfo=timezone.utc)
+  return pattern.apply(value, locale)
+
+@views.app_template_filter('datetime')
+def format_datetime(value, format='medium'):
+  if isinstance(value, str):
+    value = datetime.fromisoformat(value)
+  if current_app.config.get('DATETIME_RENDERING') == 'client':
+    # Formatted by static/js/script.js with moment.js.
+    return Markup('<time datetime="{0}" data-format="{1}">{0}</time>').format(
+      value.isoformat(timespec='minutes'), format
+    )
+  return _format_datetime(value, format, 'en')
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@views.route('/')
+def index():
+  return render_template('pages/home.html')
+
+#  ----------------------------------------------------------------
+#  Venues
+#  ----------------------------------------------------------------
+
+@views.route('/venues')
+@conditional(lambda: listings_version(Venue))
+def venues():
+  cursor = request.args.get('cursor')
+  genre = request.args.get('genre')
+  genre_ids = [Genre.id_for(genre)] if genre else None
+  city, state = request.args.get('city'), request.args.get('state')
+
+  if city is not None and state is not None:
+    # A single area: all of its venues, a page at a time.
+    query = Venue.listing_query().filter(Venue.in_areas([(city, state)]))
+    if genre_ids is not None:
+      query = query.filter(Venue.in_genres(genre_ids))
+    page = keyset_paginate(
+      query,
+      Venue.listing_key(),
+      cursor=cursor,
+      per_page=current_app.config['PAGE_SIZE'],
+      params={'genre': genre, 'city': city, 'state': state},
+      item_type=VenueItem
+    )
+    areas = [{'city': city, 'state': state, 'count': None, 'venues': page.items}]
+    return stream_page('pages/venues.html', areas=areas, page=page, genre=genre)
+
+  # The area index: a page of areas, each with its first few venues.
+  query, key = Venue.areas_query(genre_ids)
+  page = keyset_paginate(
+    query,
+    key,
+    cursor=cursor,
+    per_page=current_app.config['VENUE_AREAS_PER_PAGE'],
+    params={'genre': genre}
+  )
+  rows = []
+  if page.items:
+    rows = map(VenueItem._make, Venue.area_venues_query(
+      page.items, current_app.config['VENUES_PER_AREA'], genre_ids
+    ))
+  grouped = {
+    key: list(gd)
+    for key, gd in itertools.groupby(rows, key=lambda v: (v.city, v.state))
+  }
+  areas = [{
+    'city': area.city,
+    'state': area.state,
+    'count': area.venue_count,
+    'venues': grouped.get((area.city, area.state), [])
+  } for area in page]
+
+  return stream_page('pages/venues.html', areas=areas, page=page, genre=genre)
+
+@views.route('/venues/search', methods=['GET', 'POST'])
+def search_venues():
+  search_term = request.values.get('search_term', '')
+  page = request.values.get('page', 1, type=int)
+  response = search(Venue, search_term, page, current_app.config['SEARCH_PAGE_SIZE'])
+
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+@views.route('/venues/<int:venue_id>')
+@conditional(lambda venue_id: detail_version(Venue, venue_id))
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  html = cached_page(
+    'venue', venue_id, current_version(),
+    lambda: Venue.load_detail(venue_id),
+    lambda data: render_template('pages/show_venue.html', venue=data)
+  )
+  if html is None:
+    abort(404)
+
+  return html
+
+#  ----------------------------------------------------------------
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@views.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@views.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  form = VenueForm(request.form)
+  data = request.form
+  genres = data.to_dict(flat=False).get('genres')
+
+  try:
+    
+    if form.validate():
+      venue = Venue(
+        name=data['name'],
+        city=data['city'],
+        state=data['state'],
+        address=data['address'],
+        phone=data['phone'],
+        genres=Genre.resolve(genres),
+        facebook_link=data['facebook_link'],
+        image_link=data['image_link'],
+        website_link=data['website_link'],
+        seeking_talent=True if 'seeking_talent' in data else False,
+        seeking_description=data['seeking_description']
+      )
+      db.session.add(venue)
+      db.session.commit()
+      flash('Venue ' + data['name'] + ' was successfully listed!')
+    else:
+      raise Exception
+  except:
+    db.session.rollback()
+    flash('An error occurred. Venue ' + data['name'] + ' could not be listed.')
+  finally:
+    db.session.close()
+    return render_template('pages/home.html')
+
+@views.route('/venues/<int:venue_id>/delete', methods=['DELETE'])
+def delete_venue(venue_id):
+  try:
+    venue = Venue.query.get(venue_id)
+    db.session.delete(venue)
+    db.session.commit()
+    flash(f'Venue ID {venue_id} deleted.')
+  except:
+    db.session.rollback()
+    flash(f'Failed to delete Venue ID {venue_id}.')
+  finally:
+    db.session.close()
+    return render_template('pages/home.html')
+
+#  ----------------------------------------------------------------
+#  Artists
+#  ----------------------------------------------------------------
+@views.route('/artists')
+@conditional(lambda: listings_version(Artist))
+def artists():
+  query = Artist.listing_query()
+  genre = request.args.get('genre')
+  if genre:
+    query = query.filter(Artist.in_genres([Genre.id_for(genre)]))
+
+  page = keyset_paginate(
+    query,
+    Artist.listing_key(),
+    cursor=request.args.get('cursor'),
+    per_page=current_app.config['PAGE_SIZE'],
+    params={'genre': genre},
+    item_type=ArtistItem
+  )
+
+  return stream_page('pages/artists.html', artists=page.items, page=page)
+
+@views.route('/artists/search', methods=['GET', 'POST'])
+def search_artists():
+  search_term = request.values.get('search_term', '')
+  page = request.values.get('page', 1, type=int)
+  response = search(Artist, search_term, page, current_app.config['SEARCH_PAGE_SIZE'])
+
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+@views.route('/artists/<int:artist_id>')
+@conditional(lambda artist_id: detail_version(Artist, artist_id))
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  html = cached_page(
+    'artist', artist_id, current_version(),
+    lambda: Artist.load_detail(artist_id),
+    lambda data: render_template('pages/show_artist.html', artist=data)
+  )
+  if html is None:
+    abort(404)
+
+  return html
+
+@views.route('/artists/<int:artist_id>/delete', methods=['DELETE'])
+def delete_artist(artist_id):
+  try:
+    artist = Artist.query.get(artist_id)
+    db.session.delete(artist)
+    db.session.commit()
+    flash(f'Artist ID {artist_id} deleted.')
+  except:
+    db.session.rollback()
+    flash(f'Failed to delete Artist ID {artist_id}.')
+  finally:
+    db.session.close()
+    return render_template('pages/home.html')
+
+#  ----------------------------------------------------------------
+#  Update
+#  ----------------------------------------------------------------
+@views.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  form = ArtistForm(request.form)
+  artist = Artist.query.get(artist_id)
+
+  if artist is None:
+    abort(404)
+
+  data = {
+    'id': artist.id,
+    'name': artist.name,
+    'genres': [genre.name for genre in artist.genres],
+    'city': artist.city,
+    'state': artist.state,
+    'phone': artist.phone,
+    'website_link': artist.website_link,
+    'facebook_link': artist.facebook_link,
+    'seeking_venue': artist.seeking_venue,
+    'seeking_description': artist.seeking_description,
+    'image_link': artist.image_link
+  }
+  print(data)
+  form = ArtistForm(formdata=None, data=data)
+
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@views.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  form = ArtistForm(request.form)
+  artist = Artist.query.filter_by(id=artist_id).first()
+  try:
+    if form.validate():
+      artist.name = form.data['name']
+      artist.genres = Genre.resolve(form.data['genres'])
+      artist.city = form.data['city']
+      artist.state = form.data['state']
+      artist.phone = form.data['phone']
+      artist.website_link = form.data['website_link']
+      artist.facebook_link = form.data['facebook_link']
+      artist.image_link = form.data['image_link']
+      artist.seeking_description = form.data['seeking_description']
+      artist.seeking_venue = form.data['seeking_venue']
+      
+      artist.update_db()
+      flash(f'Artist ID {artist_id} updated.')
+      return redirect(url_for('views.show_artist', artist_id=artist_id))
+    else:
+      raise Exception
+  except:
+    db.session.rollback()
+    flash(f'Artist ID {artist_id} could not be updated.')
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+  finally:
+    db.session.close()
+
+@views.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  venue = Venue.query.get(venue_id)
+  if venue is None:
+    abort(404)
+
+  data = {
+    'id': venue.id,
+    'name': venue.name,
+    'genres': [genre.name for genre in venue.genres],
+    'address': venue.address,
+    'city': venue.city,
+    'state': venue.state,
+    'phone': venue.phone,
+    'website_link': venue.website_link,
+    'facebook_link': venue.facebook_link,
+    'seeking_talent': venue.seeking_talent,
+    'seeking_description': venue.seeking_description,
+    'image_link': venue.image_link
+  }
+  form = VenueForm(formdata=None, data=data)
+  
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@views.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  venue = Venue.query.get(venue_id)
+  if venue is None:
+    abort(404)
+  
+  form = VenueForm(request.form)
+  try:
+    if form.validate():
+      venue.name = form.data['name']
+      venue.genres = Genre.resolve(form.data['genres'])
+      venue.address = form.data['address']
+      venue.city = form.data['city']
+      venue.state = form.data['state']
+      venue.phone = form.data['phone']
+      venue.website_link = form.data['website_link']
+      venue.facebook_link = form.data['facebook_link']
+      venue.seeking_talent = form.data['seeking_talent']
+      venue.seeking_description = form.data['seeking_description']
+      venue.image_link = form.data['image_link']
+      
+      venue.update_db()
+      flash(f'Venue ID {venue_id} updated.')
+      return redirect(url_for('views.show_venue', venue_id=venue_id))
+  except:
+    db.session.rollback()
+    flash(f'Venue ID {venue_id} could not be updated.')
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+  finally:
+    db.session.close()
+
+#  ----------------------------------------------------------------
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@views.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@views.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  form = ArtistForm(request.form)
+  try:
+    if form.validate():
+      artist = Artist(
+        name=form.data['name'],
+        city=form.data['city'],
+        state=form.data['state'],
+        phone=form.data['phone'],
+        genres=Genre.resolve(form.data['genres']),
+        image_link=form.data['image_link'],
+        facebook_link=form.data['facebook_link'],
+        website_link=form.data['website_link'],
+        seeking_venue=form.data['seeking_venue'],
+        seeking_description=form.data['seeking_description']
+      )
+      db.session.add(artist)
+      db.session.commit()
+      flash('Artist ' + form.data['name'] + ' was successfully listed!')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Artist ' + form.data['name'] + ' could not be added.')
+  finally:
+    db.session.close()
+    return render_template('pages/home.html')
+  
+#  ----------------------------------------------------------------
+#  Shows
+#  ----------------------------------------------------------------
+
+@views.route('/shows')
+@conditional(lambda: listings_version(Show, Venue, Artist))
+def shows():
+  # displays list of shows at /shows
+  page = keyset_paginate(
+    Show.listing_query(),
+    Show.listing_key(),
+    cursor=request.args.get('cursor'),
+    per_page=current_app.config['PAGE_SIZE'],
+    descending=True,
+    item_type=ShowItem
+  )
+  return stream_page('pages/shows.html', shows=page.items, page=page)
+
+@views.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@views.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+  form = ShowForm(request.form)
+  try:
+    if form.validate():
+      book_shows([parse_show(form.data)], current_app.config['SHOW_BOOKING_GAP_MINUTES'])
+      flash('Show was successfully listed!')
+    else:
+      raise Exception('Failed to create new show')
+  except Exception as e:
+    db.session.rollback()
+    flash(e)
+  finally:
+    db.session.close()
+    return render_template('pages/home.html')
+  
+#  ----------------------------------------------------------------
+#  Bulk import and export
+#  ----------------------------------------------------------------
+
+def require_token(setting):
+  # The bulk endpoints only exist while their token setting is configured.
+  token = current_app.config.get(setting)
+  if not token:
+    abort(404)
+  if request.headers.get('Authorization') != f'Bearer {token}':
+    abort(401)
+
+@views.route('/import/<kind>', methods=['POST'])
+def import_listings(kind):
+  # Streams an uploaded CSV / NDJSON / JSON file into the database.
+  require_token('IMPORT_TOKEN')
+  if kind not in importer.IMPORTERS:
+    abort(404)
+
+  upload = request.files.get('file')
+  if upload is not None:
+    stream = upload.stream
+    format = request.args.get('format') or importer.format_for(upload.filename, upload.mimetype)
+  else:
+    stream = request.stream
+    format = request.args.get('format') or importer.format_for(mimetype=request.mimetype)
+  if format not in importer.FORMATS:
+    abort(400)
+
+  report = importer.import_rows(kind, stream, format, current_app.config['IMPORT_BATCH_SIZE'])
+  # A malformed file is a client error; the report says how far it got.
+  return jsonify(report.as_dict()), 400 if report.error else 200
+
+@views.route('/export/<kind>')
+def export_listings(kind):
+  # ?format=csv|ndjson|csv.gz|ndjson.gz, streamed straight from the cursor.
+  require_token('EXPORT_TOKEN')
+  format = request.args.get('format', 'csv')
+  if kind not in exporter.QUERIES:
+    abort(404)
+  if format not in exporter.FORMATS:
+    abort(400)
+  response = Response(
+    stream_with_context(exporter.stream_export(kind, format)),
+    mimetype=exporter.MIMETYPES[format]
+  )
+  response.headers['Content-Disposition'] = \
+    f'attachment; filename="{exporter.filename_for(kind, format)}"'
+  return response
+
+@views.route('/cache/stats')
+def cache_stats():
+  return jsonify(cache.stats())
+
+@views.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+@views.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500